@@ -0,0 +1,71 @@
+"""add hot path indexes
+
+為輪詢、提交、結算等熱路徑查詢加上複合索引（與 models.py 的 __table_args__ 一致），
+讓這些查詢的成本只跟單一房間的大小有關，而不是所有房間的資料量。
+event_logs 的單欄 room_id 索引由 (room_id, id) 取代。
+
+資料表由 main.py 啟動時的 Base.metadata.create_all 建立：
+新資料庫建表時已經帶有這些索引，這裡只補既有資料庫缺少的索引（已存在就跳過）。
+
+檢查：python -m pytest test_query_plans.py
+
+Revision ID: 7c2e4a91d5b3
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4a91d5b3'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名稱, 資料表, 欄位)
+INDEXES = [
+    ('idx_round_room_number', 'rounds', ['room_id', 'round_number']),
+    ('idx_player_room_host', 'players', ['room_id', 'is_host']),
+    ('idx_pair_room_player1', 'pairs', ['room_id', 'player1_id']),
+    ('idx_pair_room_player2', 'pairs', ['room_id', 'player2_id']),
+    ('idx_pair_round', 'pairs', ['round_id']),
+    ('idx_action_player', 'actions', ['player_id']),
+    ('idx_action_room_choice', 'actions', ['room_id', 'choice']),
+    ('idx_message_round_receiver', 'messages', ['round_id', 'receiver_id']),
+    ('idx_message_round_sender', 'messages', ['round_id', 'sender_id']),
+    ('idx_indicator_room', 'indicators', ['room_id']),
+    ('idx_event_room_id', 'event_logs', ['room_id', 'id']),
+]
+
+# 被 idx_event_room_id 取代的舊索引
+REPLACED_INDEXES = [
+    ('ix_event_logs_room_id', 'event_logs', ['room_id']),
+]
+
+
+def _existing_indexes(table: str) -> set:
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+    for name, table, _ in REPLACED_INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table, columns in REPLACED_INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
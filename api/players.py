@@ -9,7 +9,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 import logging
 
-from database import get_db
+from database import get_db, primary_pins
 from models import Player, RoomStatus
 from schemas import PlayerJoin, PlayerResponse
 from core.room_manager import RoomManager
@@ -57,6 +57,8 @@ def join_room(code: str, player_data: PlayerJoin, db: Session = Depends(get_db))
         bump_state_version(db, room.id, reason="player_joined")
         db.commit()
         db.refresh(player)
+        # read-your-writes：新玩家接下來的 GET 先讀 primary
+        primary_pins.pin(player.id)
 
         logger.info(
             f"Player {player.id} ({player.nickname}) joined room {room.id}"
@@ -13,12 +13,16 @@ Room API Endpoints
 - 狀態轉換（由 StateMachine 負責）
 - 資料驗證（由 Manager 負責）
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+import asyncio
 import logging
+import time
 
-from database import get_db
-from models import EventLog
+from database import async_engine, get_db, get_read_db, primary_pins
 from schemas import (
     RoomCreate,
     RoomResponse,
@@ -27,8 +31,11 @@ from schemas import (
     PlayerSummary,
     GameStats,
     RoomStateResponse,
+    RoomBatchPollRequest,
+    RoomBatchPollResponse,
 )
 from core.room_manager import RoomManager
+from core.ws_hub import fetch_events_since, EVENTS_PAGE_SIZE
 from core.round_manager import RoundManager
 from core.exceptions import (
     RoomNotFound,
@@ -38,11 +45,39 @@ from core.exceptions import (
 )
 from services.payoff_service import calculate_total_payoff
 from services.history_service import get_player_round_history
-from services.state_service import build_room_state
+from services.state_service import (
+    RenderedRoomState,
+    load_room_state,
+    load_room_state_async,
+    peek_state_version,
+    fetch_state_version,
+    fetch_state_version_async,
+    summarize_changed_rooms
+)
+from services.state_broker import state_broker
+from services.version_table import room_versions
+from services.state_history import state_history
+from services.snapshot_cache import SHARED_KEY, snapshot_cache
+from utils.http_cache import (
+    IMMUTABLE,
+    REVALIDATE,
+    etag_matches,
+    make_etag,
+    not_modified,
+    set_etag
+)
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 logger = logging.getLogger(__name__)
 
+# 長輪詢最長等待秒數（避免被瀏覽器或反向代理的 idle timeout 切斷）
+MAX_STATE_WAIT_SECONDS = 30
+# SSE：閒置時送 keep-alive 註解的間隔，以及向 DB 重新確認版本的間隔
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RESYNC_SECONDS = 60
+# replica 還沒追上版本表（primary 已 commit）時，重新讀取 replica 的間隔
+REPLICA_LAG_RETRY_SECONDS = 0.25
+
 
 @router.get("", response_model=dict)
 def list_rooms(
@@ -100,13 +135,18 @@ def list_rooms(
         # 排序和分頁
         rooms = query.order_by(Room.updated_at.desc()).offset(offset).limit(limit).all()
 
+        # 一次算出這一頁所有房間的玩家數（避免每個房間各查一次）
+        player_counts = dict(
+            db.query(Player.room_id, func.count(Player.id))
+            .filter(Player.room_id.in_([room.id for room in rooms]), Player.is_host == False)
+            .group_by(Player.room_id)
+            .all()
+        )
+
         # 組裝回應
         room_list = []
         for room in rooms:
-            player_count = db.query(Player).filter(
-                Player.room_id == room.id,
-                Player.is_host == False
-            ).count()
+            player_count = player_counts.get(room.id, 0)
 
             room_list.append({
                 "room_id": room.id,
@@ -200,24 +240,71 @@ def get_room_status(code: str, db: Session = Depends(get_db)):
 
 
 @router.get("/{room_id}/state", response_model=RoomStateResponse)
-def get_room_state(
+async def get_room_state(
     room_id: str,
+    request: Request,
+    response: Response,
     version: int = Query(0, description="Client-side state_version, 0 for first load"),
     player_id: str | None = Query(None, description="Optional player id for personalized data"),
-    db: Session = Depends(get_db)
+    wait: float = Query(
+        0,
+        ge=0,
+        le=MAX_STATE_WAIT_SECONDS,
+        description="Long-poll: seconds to wait for a newer version when the client is up-to-date"
+    ),
+    delta: bool = Query(False, description="Return a JSON Patch from `version` instead of the full snapshot when possible")
 ):
     """
     短輪詢 endpoint：返回房間的最新狀態快照
 
     - 如果 client 傳入的 version 已經是最新，回傳 has_update=false
     - 如果有更新，返回完整快照（room/players/round/message/indicator）
+    - wait > 0 時為長輪詢：version 已是最新就等待新版本 commit（最多 wait 秒）再回應
+    - delta=true 時，若伺服器還留著 client 那個版本的快照，回傳 base_version + patch
+      （RFC 6902 JSON Patch，套用在上一份 data 上）取代 data；否則照常回完整快照
+
+    快速路徑：
+        - has_update=false 只比對記憶體版本表，不建立 Session、不載入 Room
+        - 版本表 miss 才做一次單欄位 SELECT state_version
+
+    HTTP 快取：
+        - ETag 由 state_version + player_id 組成，在建立快照之前就能決定
+        - If-None-Match 命中時直接回 304（不序列化、不傳 body）
+
+    注意：
+        - 等待期間不持有 DB 連線，也不佔用 threadpool（只在 event loop 上等）
+        - 通知只在同一個 process 內傳遞，逾時後一定會再查一次 DB
+        - 版本表由 primary 的 commit 更新，快照卻從 replica 讀：replica 落後時讀到的版本
+          可能不比 client 新，這時在剩餘的 wait 時間內每 REPLICA_LAG_RETRY_SECONDS 重讀一次，
+          不回 has_update=false 讓 client 立刻再問
     """
+    deadline = time.monotonic() + wait
     try:
-        return build_room_state(
-            db,
-            room_id=room_id,
-            client_version=version,
-            player_id=player_id
+        current_version = await _current_state_version(room_id, version, player_id)
+
+        if version >= current_version and wait > 0:
+            await state_broker.wait_for_version(room_id, version, timeout=wait)
+            current_version = await _current_state_version(room_id, version, player_id)
+
+        etag = make_etag("state", room_id, current_version, player_id or SHARED_KEY)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+
+        if version >= current_version:
+            return RoomStateResponse(version=current_version, has_update=False)
+
+        rendered = await _load_state(room_id, version, player_id, delta)
+        while not rendered.has_update and time.monotonic() + REPLICA_LAG_RETRY_SECONDS <= deadline:
+            await asyncio.sleep(REPLICA_LAG_RETRY_SECONDS)
+            rendered = await _load_state(room_id, version, player_id, delta)
+        # 快照已預先序列化，直接回 bytes（不再經過 response_model 驗證）
+        # 建快照期間可能又有新版本 commit，ETag 以實際回傳的版本為準
+        etag = make_etag("state", room_id, rendered.version, player_id or SHARED_KEY)
+        return Response(
+            content=rendered.body,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": REVALIDATE}
         )
     except RoomNotFound:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -226,6 +313,176 @@ def get_room_state(
         raise HTTPException(status_code=500, detail="Internal error")
 
 
+@router.post("/state/batch", response_model=RoomBatchPollResponse)
+def batch_poll_rooms(batch: RoomBatchPollRequest, db: Session = Depends(get_db)):
+    """
+    批次輪詢 endpoint（Host 儀表板同時開多個房間）
+
+    請求：
+        {"rooms": [{"room_id": "...", "version": 12}, ...]}（最多 100 個）
+
+    返回：
+        - rooms: 只包含 version 比請求新的房間，每個房間一筆摘要
+            - version / status / current_round
+            - round_status / submitted_actions / total_players（當前回合進度）
+            - ready_to_publish: 全員已提交、等待公布
+            - player_count: 玩家數量（不含 Host）
+        - missing: 不存在的 room_id
+
+    效能：
+        - 記憶體版本表已知未變更的房間不查 DB
+        - 其餘房間用一個 set-based 查詢取得（不論房間數量）
+        - 客戶端把每個房間的 version 換成回應中的新 version，再送下一次請求
+    """
+    try:
+        client_versions = {r.room_id: r.version for r in batch.rooms}
+        summaries, missing = summarize_changed_rooms(db, client_versions)
+        return RoomBatchPollResponse(rooms=summaries, missing=missing)
+    except Exception as e:
+        logger.error(f"Failed to batch poll rooms: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal error")
+
+
+async def _current_state_version(room_id: str, client_version: int, player_id: str | None = None) -> int:
+    """
+    /state 的快速路徑：先查記憶體版本表（不碰 DB、不進 threadpool），
+    miss 時才做單欄位 SELECT state_version（async engine，沒有的話在 threadpool）
+
+    player_id 剛寫入過（read-your-writes）時改讀 primary
+    """
+    current_version = peek_state_version(room_id, client_version)
+    if current_version is None:
+        primary = primary_pins.is_pinned(player_id)
+        if async_engine is not None and not primary:
+            current_version = await fetch_state_version_async(room_id, client_version)
+        else:
+            current_version = await run_in_threadpool(fetch_state_version, room_id, client_version, primary)
+    if current_version is None:
+        raise RoomNotFound(room_id)
+    return current_version
+
+
+async def _load_state(
+    room_id: str,
+    version: int,
+    player_id: str | None,
+    delta: bool = False
+) -> RenderedRoomState:
+    """
+    建立 /state 回應：有 async engine 時直接在 event loop 上查詢，
+    不佔 threadpool；沒有時退回 threadpool + 同步 Session
+
+    讀 replica；player_id 剛寫入過（read-your-writes）時改在 threadpool 讀 primary
+    """
+    primary = primary_pins.is_pinned(player_id)
+    if async_engine is not None and not primary:
+        return await load_room_state_async(room_id, version, player_id, delta)
+    return await run_in_threadpool(load_room_state, room_id, version, player_id, delta, primary)
+
+
+@router.get("/{room_id}/state/stream")
+async def stream_room_state(
+    room_id: str,
+    request: Request,
+    version: int = Query(0, description="Client-side state_version to resume from"),
+    player_id: str | None = Query(None, description="Optional player id for personalized data"),
+    notify_only: bool = Query(False, description="Only push version-changed notices, not full snapshots")
+):
+    """
+    Server-Sent Events：每次 state_version 變更就推送給客戶端
+
+    事件格式：
+        - event: state   → data 為 /state 的完整回應（has_update=true）
+        - event: version → notify_only=true 時只送 {"version": N}，由客戶端自行呼叫 /state
+        - id 欄位為 state_version，瀏覽器 EventSource 重連時會帶 Last-Event-ID 自動續傳
+
+    設計：
+        - 每個連線只是一個在 event loop 上等待的 coroutine，不佔 DB 連線或 threadpool
+        - 版本通知來自同一 process 的 StateVersionBroker；每 SSE_RESYNC_SECONDS
+          會再向 DB 確認一次，涵蓋其他 worker process commit 的變更
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        version = max(version, int(last_event_id))
+
+    try:
+        first_state = await _load_state(room_id, version, player_id)
+    except RoomNotFound:
+        raise HTTPException(status_code=404, detail="Room not found")
+    except Exception as e:
+        logger.error(f"Failed to open state stream: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal error")
+
+    return StreamingResponse(
+        _state_event_stream(room_id, version, player_id, notify_only, first_state),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 關閉 nginx 緩衝，事件才會即時送出
+        }
+    )
+
+
+def _format_sse(event: str, data: str, event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _state_event_stream(
+    room_id: str,
+    version: int,
+    player_id: str | None,
+    notify_only: bool,
+    state: RenderedRoomState
+):
+    """產生 SSE 事件；客戶端斷線時 Starlette 會取消這個 generator"""
+    yield f"retry: {SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+    last_resync = time.monotonic()
+
+    while True:
+        if state.has_update:
+            version = state.version
+            if notify_only:
+                yield _format_sse("version", f'{{"version": {version}}}', version)
+            else:
+                yield _format_sse("state", state.body.decode(), version)
+
+        new_version = await state_broker.wait_for_version(
+            room_id, version, timeout=SSE_HEARTBEAT_SECONDS
+        )
+
+        state = RenderedRoomState(version, False, b"")
+        if new_version is None:
+            yield ": keep-alive\n\n"
+            if time.monotonic() - last_resync < SSE_RESYNC_SECONDS:
+                continue
+            last_resync = time.monotonic()
+            try:
+                new_version = await _current_state_version(room_id, version, player_id)
+            except RoomNotFound:
+                yield _format_sse("deleted", f'{{"room_id": "{room_id}"}}')
+                return
+            if new_version <= version:
+                continue
+
+        try:
+            if notify_only:
+                state = RenderedRoomState(new_version, True, b"")
+            else:
+                state = await _load_state(room_id, version, player_id)
+        except RoomNotFound:
+            yield _format_sse("deleted", f'{{"room_id": "{room_id}"}}')
+            return
+
+        if not state.has_update:
+            # 版本表已經是新版本但 replica 還沒追上：稍後再讀，不要立刻重試
+            await asyncio.sleep(REPLICA_LAG_RETRY_SECONDS)
+
+
 @router.post("/{room_id}/start")
 def start_game(room_id: str, db: Session = Depends(get_db)):
     """
@@ -236,16 +493,13 @@ def start_game(room_id: str, db: Session = Depends(get_db)):
     - 玩家數量必須 >= 2 且為偶數
 
     流程：
-    1. 呼叫 RoomManager.start_game()
-    2. 自動建立第一輪（Round 1）
-    3. 返回成功（前端透過短輪詢 /state 得知變化）
+    1. 呼叫 RoomManager.start_game_with_first_round()
+       （開始遊戲 + 建立第一輪在同一個 transaction，消除 current_round=0 的中間狀態，
+       state_version 也只 bump 一次）
+    2. 返回成功（前端透過短輪詢 /state 得知變化）
     """
     try:
-        # 1. 開始遊戲（業務邏輯）
-        RoomManager.start_game(db, room_id)
-
-        # 2. 立即建立第一輪（消除 current_round=0 的中間狀態）
-        RoundManager.create_round(db, room_id)
+        RoomManager.start_game_with_first_round(db, room_id)
 
         return {"status": "ok"}
 
@@ -325,8 +579,10 @@ def end_game(room_id: str, db: Session = Depends(get_db)):
 @router.get("/{room_id}/summary", response_model=GameSummaryResponse)
 def get_game_summary(
     room_id: str,
+    request: Request,
+    response: Response,
     player_id: str | None = Query(None, description="Optional player_id to include personal history"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得遊戲摘要（排名和統計）
@@ -343,8 +599,19 @@ def get_game_summary(
         - stats: 整體統計
             - accelerate_ratio: 加速比例
             - turn_ratio: 轉向比例
+
+    HTTP 快取：
+        - 房間 FINISHED 後摘要不會再變，回傳 immutable ETag
+        - If-None-Match 命中時只確認房間（與玩家）還在，不查內容，直接回 304
     """
-    from models import Player, Action, Choice
+    from models import Player, Action, Choice, RoomStatus
+
+    etag = make_etag("summary", room_id, player_id or SHARED_KEY)
+    if (
+        etag_matches(request.headers.get("if-none-match"), etag)
+        and RoomManager.room_has_player(db, room_id, player_id)
+    ):
+        return not_modified(etag, IMMUTABLE)
 
     try:
         # 1. 檢查房間是否存在
@@ -392,6 +659,9 @@ def get_game_summary(
             player_history = get_player_round_history(room_id, player_id, db)
             player_total = calculate_total_payoff(player_id, db)
 
+        if room.status == RoomStatus.FINISHED:
+            set_etag(response, etag, IMMUTABLE)
+
         return GameSummaryResponse(
             players=player_summaries,
             stats=stats,
@@ -399,6 +669,8 @@ def get_game_summary(
             player_total_payoff=player_total
         )
 
+    except HTTPException:
+        raise
     except RoomNotFound:
         raise HTTPException(status_code=404, detail="Room not found")
     except Exception as e:
@@ -410,13 +682,13 @@ def get_game_summary(
 def get_events_since(
     room_id: str,
     last_event_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得指定事件 ID 之後的所有事件
 
     用途：
-    - WebSocket 斷線後重連，補發遺漏的事件
+    - WebSocket 斷線後重連，補發遺漏的事件（/ws?last_event_id= 也是同一語意）
     - 前端可以用此 API 確保不會漏掉任何狀態變更
 
     參數：
@@ -436,13 +708,8 @@ def get_events_since(
         會返回 event_id > 100 的所有事件
     """
     try:
-        # 限制返回數量，避免一次返回太多
-        MAX_EVENTS = 100
-
-        events = db.query(EventLog).filter(
-            EventLog.room_id == room_id,
-            EventLog.id > last_event_id
-        ).order_by(EventLog.id).limit(MAX_EVENTS).all()
+        # 限制返回數量，避免一次返回太多（與 WebSocket 補發共用同一個查詢）
+        events = fetch_events_since(db, room_id, last_event_id, EVENTS_PAGE_SIZE)
 
         return {
             "events": [
@@ -491,6 +758,10 @@ def delete_room(room_id: str, db: Session = Depends(get_db)):
         # 刪除房間（級聯刪除會自動清理所有相關資料）
         db.delete(room)
         db.commit()
+        state_broker.forget(room_id)
+        room_versions.forget(room_id)
+        state_history.forget_room(room_id)
+        snapshot_cache.invalidate_room(room_id)
 
         return {
             "status": "deleted",
@@ -4,15 +4,15 @@ Round API Endpoints - 短輪詢版
 重點：
 1. submit_action 冪等，並在 state_version 上反映進度
 2. 所有業務邏輯集中在 RoundManager
-3. WebSocket 全面移除，前端靠 /state 獲取更新
+3. 前端靠 /state 獲取更新；WebSocket（api/ws.py）只做事件通知
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 import logging
 
-from database import get_db
-from models import Round, Player, Action, Message, RoundStatus, Choice
+from database import get_db, get_read_db, primary_pins
+from models import Round, Player, Action, Message, RoundStatus
 from schemas import (
     RoundCurrentResponse,
     PairResponse,
@@ -23,6 +23,7 @@ from schemas import (
     MessageResponse,
     IndicatorResponse
 )
+from core.event_sink import record_event
 from core.round_manager import RoundManager
 from core.room_manager import RoomManager
 from core.exceptions import (
@@ -40,6 +41,7 @@ from services.indicator_service import (
 )
 from services.round_phase_service import is_message_round
 from services.state_service import bump_state_version
+from utils.http_cache import IMMUTABLE, etag_matches, make_etag, not_modified, set_etag
 
 router = APIRouter(prefix="/api/rooms", tags=["rounds"])
 logger = logging.getLogger(__name__)
@@ -77,8 +79,10 @@ def get_current_round(room_id: str, db: Session = Depends(get_db)):
 def get_player_pair(
     room_id: str,
     round_number: int,
+    request: Request,
+    response: Response,
     player_id: str = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得玩家在某回合的對手資訊
@@ -91,7 +95,16 @@ def get_player_pair(
     返回：
         - opponent_id: 對手 UUID
         - opponent_display_name: 對手顯示名稱
+
+    配對建立後不會再變，回傳 immutable ETag；If-None-Match 命中（且玩家仍在房間內）直接回 304
     """
+    etag = make_etag("pair", room_id, round_number, player_id)
+    if (
+        etag_matches(request.headers.get("if-none-match"), etag)
+        and RoomManager.room_has_player(db, room_id, player_id)
+    ):
+        return not_modified(etag, IMMUTABLE)
+
     try:
         # 1. 找到回合
         round_obj = RoundManager.get_round_by_number(db, room_id, round_number)
@@ -106,11 +119,14 @@ def get_player_pair(
         if not opponent:
             raise HTTPException(status_code=404, detail="Opponent not found")
 
+        set_etag(response, etag, IMMUTABLE)
         return PairResponse(
             opponent_id=opponent_id,
             opponent_display_name=opponent.display_name
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -129,9 +145,9 @@ def submit_action(
     提交玩家動作（核心重構！）
 
     **重大改動**：
-    1. 使用 RoundManager.submit_action() - 冪等性設計
-    2. 呼叫 RoundManager.try_finalize_round() - 安全的並發設計
-    3. 狀態更新改由 state_version 控制，前端靠短輪詢 /state 更新畫面
+    1. 使用 RoundManager.submit_and_try_finalize() - 提交與結算在同一個 transaction
+       （冪等性設計 + 安全的並發設計，每個 row 只鎖一次）
+    2. 狀態更新改由 state_version 控制，前端靠短輪詢 /state 更新畫面
 
     **消除特殊情況**：
     - 舊版：「最後一個人觸發結算」- 有特殊邏輯
@@ -143,8 +159,7 @@ def submit_action(
 
     流程：
     1. 找到回合
-    2. 提交動作（冪等）
-    3. 嘗試結算（冪等）
+    2. 提交動作並嘗試結算（冪等，單一 transaction）
 
     參數：
         room_id: 房間 UUID
@@ -165,24 +180,25 @@ def submit_action(
             f"in round {round_number} (room={room_id}): {action_data.choice.value}"
         )
 
-        # 2. 提交動作（冪等：重複提交會返回既有 Action）
-        action, created_new = RoundManager.submit_action(
+        # 2. 提交動作並嘗試計算回合結果（同一個 transaction）
+        #    冪等：重複提交會返回既有 Action，已結算的回合不會重複計算
+        #    注意：這裡只計算，不公布結果
+        action, created_new, finalized = RoundManager.submit_and_try_finalize(
             db,
             round_obj.id,
             action_data.player_id,
             action_data.choice
         )
         logger.info(
-            "Action %s for player %s in round %s (room=%s)",
+            "Action %s for player %s in round %s (room=%s), finalized=%s",
             "created" if created_new else "reused",
             action_data.player_id,
             round_number,
-            room_id
+            room_id,
+            finalized
         )
-
-        # 3. 嘗試計算回合結果（冪等：重複呼叫不會重複計算）
-        #    注意：這裡只計算，不公布結果
-        finalized = RoundManager.try_finalize_round(db, round_obj.id)
+        # read-your-writes：這位玩家接下來的 GET 先讀 primary
+        primary_pins.pin(action_data.player_id)
 
         return ActionResponse(status="ok")
 
@@ -266,47 +282,16 @@ def skip_round(
         if not round_obj:
             raise HTTPException(status_code=404, detail="Round not found")
 
-        # 2. 檢查狀態（只能跳過 WAITING_ACTIONS 或 READY_TO_PUBLISH）
-        if round_obj.status not in [RoundStatus.WAITING_ACTIONS, RoundStatus.READY_TO_PUBLISH]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot skip round in status {round_obj.status.value}"
-            )
-
-        logger.info(f"Skipping round {round_number} for room {room_id}")
-
-        # 3. 為未提交的玩家填入預設動作
-        from services.pairing_service import get_pairs_in_round
-        pairs = get_pairs_in_round(round_obj.id, db)
-
-        for pair in pairs:
-            for player_id in [pair.player1_id, pair.player2_id]:
-                # 檢查該玩家是否已提交
-                existing = db.query(Action).filter(
-                    Action.round_id == round_obj.id,
-                    Action.player_id == player_id
-                ).first()
-
-                if not existing:
-                    # 預設選擇：TURN（轉彎）
-                    logger.info(f"Auto-submitting TURN for player {player_id}")
-                    RoundManager.submit_action(
-                        db, round_obj.id, player_id, Choice.TURN
-                    )
-
-        # 4. 計算結果（如果還沒計算）
-        if round_obj.status == RoundStatus.WAITING_ACTIONS:
-            RoundManager.try_finalize_round(db, round_obj.id)
-
-        # 5. 立即公布結果
-        RoundManager.publish_round(db, round_obj.id)
+        # 2. 補齊未提交的動作（TURN）、結算、公布：一個 transaction、一次 bump
+        RoundManager.skip_round(db, round_obj.id)
 
         logger.info(f"Round {round_number} skipped and published for room {room_id}")
         return ActionResponse(status="ok")
 
+    except InvalidStateTransition as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to skip round: {e}", exc_info=True)
-        db.rollback()
         raise HTTPException(status_code=500, detail="Internal error")
 
 
@@ -314,8 +299,10 @@ def skip_round(
 def get_round_result(
     room_id: str,
     round_number: int,
+    request: Request,
+    response: Response,
     player_id: str = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得回合結果
@@ -329,7 +316,16 @@ def get_round_result(
         - opponent_choice: 對手的選擇
         - your_payoff: 你的分數
         - opponent_payoff: 對手的分數
+
+    結果算出後不會再變，回傳 immutable ETag；If-None-Match 命中（且玩家仍在房間內）直接回 304
     """
+    etag = make_etag("result", room_id, round_number, player_id)
+    if (
+        etag_matches(request.headers.get("if-none-match"), etag)
+        and RoomManager.room_has_player(db, room_id, player_id)
+    ):
+        return not_modified(etag, IMMUTABLE)
+
     try:
         # 1. 找到回合
         round_obj = RoundManager.get_round_by_number(db, room_id, round_number)
@@ -356,6 +352,7 @@ def get_round_result(
         if not opponent or not opponent_action:
             raise HTTPException(status_code=500, detail="Opponent data not found")
 
+        set_etag(response, etag, IMMUTABLE)
         return RoundResultResponse(
             opponent_display_name=opponent.display_name,
             your_choice=player_action.choice,
@@ -364,6 +361,8 @@ def get_round_result(
             opponent_payoff=opponent_action.payoff
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -426,6 +425,7 @@ def send_message(
         db.add(message)
         bump_state_version(db, room_id, reason="message_sent")
         db.commit()
+        primary_pins.pin(message_data.sender_id)
 
         return ActionResponse(status="ok")
 
@@ -443,8 +443,10 @@ def send_message(
 def get_message(
     room_id: str,
     round_number: int,
+    request: Request,
+    response: Response,
     player_id: str = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得對手發送的訊息
@@ -457,7 +459,16 @@ def get_message(
     返回：
         - content: 訊息內容
         - from_opponent: True（固定值）
+
+    每回合只能送一次訊息，收到後不會再變，回傳 immutable ETag
     """
+    etag = make_etag("message", room_id, round_number, player_id)
+    if (
+        etag_matches(request.headers.get("if-none-match"), etag)
+        and RoomManager.room_has_player(db, room_id, player_id)
+    ):
+        return not_modified(etag, IMMUTABLE)
+
     try:
         # 1. 找到回合
         round_obj = RoundManager.get_round_by_number(db, room_id, round_number)
@@ -473,6 +484,7 @@ def get_message(
         if not message:
             raise HTTPException(status_code=404, detail="No message found")
 
+        set_etag(response, etag, IMMUTABLE)
         return MessageResponse(content=message.content, from_opponent=True)
 
     except HTTPException:
@@ -495,7 +507,7 @@ def assign_indicators_endpoint(room_id: str, db: Session = Depends(get_db)):
     流程：
     1. 檢查是否已分配
     2. 呼叫 IndicatorService.assign_indicators()
-    3. 發送 WebSocket 通知
+    3. 記錄 INDICATORS_ASSIGNED 事件（WebSocket Hub 會推送）
     """
     try:
         # 1. 檢查房間
@@ -514,6 +526,7 @@ def assign_indicators_endpoint(room_id: str, db: Session = Depends(get_db)):
 
         # 4. 分配指標並提升版本
         assign_indicators(room_id, db)
+        record_event(db, room_id, "INDICATORS_ASSIGNED", {"round_number": room.current_round})
         bump_state_version(db, room_id, reason="indicators_assigned")
         db.commit()
 
@@ -532,8 +545,10 @@ def assign_indicators_endpoint(room_id: str, db: Session = Depends(get_db)):
 @router.get("/{room_id}/indicator", response_model=IndicatorResponse)
 def get_player_indicator_endpoint(
     room_id: str,
+    request: Request,
+    response: Response,
     player_id: str = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     取得玩家的指標符號
@@ -544,9 +559,19 @@ def get_player_indicator_endpoint(
 
     返回：
         - symbol: 指標符號（例如：🍋）
+
+    指標只分配一次，回傳 immutable ETag
     """
+    etag = make_etag("indicator", room_id, player_id)
+    if (
+        etag_matches(request.headers.get("if-none-match"), etag)
+        and RoomManager.room_has_player(db, room_id, player_id)
+    ):
+        return not_modified(etag, IMMUTABLE)
+
     try:
         symbol = get_player_indicator(player_id, db)
+        set_etag(response, etag, IMMUTABLE)
         return IndicatorResponse(symbol=symbol)
 
     except ValueError as e:
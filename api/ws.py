@@ -0,0 +1,129 @@
+"""
+WebSocket Endpoint：房間事件推送
+
+職責：
+1. 接受連線並訂閱房間（core.ws_hub）
+2. 斷線重連時依 last_event_id 補發（與 /events/since 相同語意）
+3. 把 Hub 推來的 WSEvent 送給客戶端
+
+短輪詢 /state 仍然是狀態的唯一來源；WebSocket 只負責「有事發生了」的即時通知。
+"""
+import asyncio
+import logging
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import Room
+from core.ws_hub import (
+    EVENTS_PAGE_SIZE,
+    Subscription,
+    fetch_events_since,
+    to_ws_events,
+    ws_hub
+)
+
+router = APIRouter(prefix="/api/rooms", tags=["websocket"])
+logger = logging.getLogger(__name__)
+
+# 自訂 close code（4000-4999 保留給應用程式）
+WS_CLOSE_ROOM_NOT_FOUND = 4404
+# RFC 6455：Try Again Later，用於慢速連線被踢掉
+WS_CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def _room_exists(room_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(Room.id).filter(Room.id == room_id).first() is not None
+    finally:
+        db.close()
+
+
+def _load_backlog(room_id: str, last_event_id: int) -> tuple[list, int]:
+    """
+    取得 last_event_id 之後所有要推送的事件
+
+    返回：
+        (WSEvent 列表, 已看過的最大 event_id)
+    """
+    db = SessionLocal()
+    try:
+        backlog = []
+        cursor = last_event_id
+        while True:
+            page = fetch_events_since(db, room_id, cursor, EVENTS_PAGE_SIZE)
+            for e in page:
+                backlog.extend(to_ws_events(e.id, e.room_id, e.event_type, e.data))
+                cursor = e.id
+            if len(page) < EVENTS_PAGE_SIZE:
+                return backlog, cursor
+    finally:
+        db.close()
+
+
+async def _pump_events(websocket: WebSocket, subscription: Subscription, sent_up_to: int) -> None:
+    while True:
+        ws_event = await subscription.queue.get()
+        if ws_event is None:
+            await websocket.close(code=WS_CLOSE_TRY_AGAIN_LATER)
+            return
+        if ws_event.event_id is not None and ws_event.event_id <= sent_up_to:
+            continue  # 補發時已經送過
+        await websocket.send_text(ws_event.model_dump_json())
+
+
+@router.websocket("/{room_id}/ws")
+async def room_websocket(
+    websocket: WebSocket,
+    room_id: str,
+    last_event_id: int | None = Query(None, description="Last EventLog id the client has seen")
+):
+    """
+    房間事件 WebSocket
+
+    訊息格式（JSON）：
+        - event_id: EventLog id（重連時帶入 last_event_id）
+        - event_type: WSEventType
+        - room_id: 房間 UUID
+        - data: 事件資料
+
+    重連：
+        ws://.../api/rooms/{room_id}/ws?last_event_id=123
+        會先補發 event_id > 123 的事件，再接上即時事件
+
+    注意：
+        - 連線 queue 滿了（客戶端太慢）會以 1013 關閉，請重連並帶 last_event_id
+        - 客戶端送來的訊息會被忽略（可用來做 keep-alive）
+    """
+    if not await run_in_threadpool(_room_exists, room_id):
+        await websocket.close(code=WS_CLOSE_ROOM_NOT_FOUND)
+        return
+
+    await websocket.accept()
+
+    # 先訂閱再補發，補發期間 commit 的事件會留在 queue 裡（用 event_id 去重）
+    subscription = ws_hub.subscribe(room_id)
+    pump = None
+    try:
+        sent_up_to = 0
+        if last_event_id is not None:
+            backlog, sent_up_to = await run_in_threadpool(_load_backlog, room_id, last_event_id)
+            for ws_event in backlog:
+                await websocket.send_text(ws_event.model_dump_json())
+
+        pump = asyncio.create_task(_pump_events(websocket, subscription, sent_up_to))
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"WebSocket error in room {room_id}: {e}", exc_info=True)
+    finally:
+        if pump is not None:
+            pump.cancel()
+        ws_hub.unsubscribe(subscription)
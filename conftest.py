@@ -0,0 +1,56 @@
+"""
+pytest 共用設定
+
+測試使用暫存目錄裡的 SQLite 檔案：DATABASE_URL 必須在任何模組 import database 之前設定，
+所以放在 conftest.py 的最上面（pytest 會先載入這個檔案），不會動到 ./chicken_game.db
+"""
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="chicken_game_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.db"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import pytest
+
+from database import Base, SessionLocal, engine
+from models import Player
+
+
+@pytest.fixture(scope="session", autouse=True)
+def create_tables():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_game(db):
+    """
+    建立一個已開始的房間（Round 1 已建立並配對）
+
+    返回：
+        make_game(players=4) -> (room_id, round_id, player_ids)
+    """
+    from core.room_manager import RoomManager
+
+    def make(players: int = 4):
+        room, _ = RoomManager.create_room(db)
+        for i in range(players):
+            db.add(Player(room_id=room.id, nickname=f"p{i}", display_name=f"p{i}"))
+        db.commit()
+        room, round1 = RoomManager.start_game_with_first_round(db, room.id)
+        player_ids = [
+            p.id for p in db.query(Player).filter(Player.room_id == room.id, Player.is_host == False)
+        ]
+        return room.id, round1.id, player_ids
+
+    return make
@@ -0,0 +1,256 @@
+"""
+Event Sink：EventLog 的寫入入口
+
+職責：
+1. 所有業務事件都透過 record_event() 寫入，不直接 db.add(EventLog(...))
+2. 依事件類型決定持久化策略（EVENT_DURABILITY）
+3. 非即時事件先放在記憶體緩衝，由背景 thread 批次寫入
+
+持久化策略：
+- TRANSACTIONAL：和業務資料同一個 transaction 寫入（WebSocket 推送、/events/since 補發依賴這些）
+- BUFFERED：只供 audit / debug 使用，commit 後才交給 sink，定時或累積到一定數量時
+  以一次 bulk INSERT 寫入；rollback 的 transaction 不會留下任何事件
+
+注意：
+- BUFFERED 事件的 created_at 是呼叫 record_event 的時間，但 id 會比同時期的 TRANSACTIONAL 事件大
+- process 異常終止時，尚未 flush 的 BUFFERED 事件會遺失（正常關閉會在 stop() 時 flush）
+- sink 沒啟動時（腳本、測試）一律退回同步寫入，行為與原本相同
+"""
+import enum
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, settings
+from models import EventLog
+
+logger = logging.getLogger(__name__)
+
+# Session.info key：這個 transaction commit 後要交給 sink 的事件
+_PENDING_BUFFERED_KEY = "pending_buffered_events"
+
+
+class Durability(str, enum.Enum):
+    TRANSACTIONAL = "TRANSACTIONAL"
+    BUFFERED = "BUFFERED"
+
+
+# event_type -> 持久化策略（沒有列出的一律 TRANSACTIONAL）
+# 會推送到 WebSocket 的事件（core/ws_hub.EVENT_TYPE_MAP）不可以設成 BUFFERED
+EVENT_DURABILITY: Dict[str, Durability] = {
+    "STATE_VERSION_BUMPED": Durability.BUFFERED,
+    "ROOM_STATE_CHANGED": Durability.BUFFERED,
+    "ROUND_STATE_CHANGED": Durability.BUFFERED,
+}
+
+
+def durability_of(event_type: str) -> Durability:
+    return EVENT_DURABILITY.get(event_type, Durability.TRANSACTIONAL)
+
+
+def record_event(db: Session, room_id: str, event_type: str, data: Optional[dict] = None) -> None:
+    """
+    記錄一筆業務事件
+
+    參數：
+        db: 目前 transaction 的 session
+        room_id: 房間 ID
+        event_type: 事件類型（例如 "ROUND_CREATED"）
+        data: 事件內容（JSON）
+
+    注意：
+        - TRANSACTIONAL 事件直接加入 session，隨外層 transaction commit
+        - BUFFERED 事件在 commit 之後才進入 sink 緩衝（rollback 則丟棄）
+    """
+    if durability_of(event_type) is Durability.BUFFERED and event_sink.running:
+        db.info.setdefault(_PENDING_BUFFERED_KEY, []).append({
+            "room_id": room_id,
+            "event_type": event_type,
+            "data": data,
+            "created_at": datetime.utcnow(),
+        })
+        return
+
+    db.add(EventLog(room_id=room_id, event_type=event_type, data=data))
+
+
+class EventSink:
+    """
+    BUFFERED 事件的記憶體緩衝 + 背景批次寫入
+
+    flush 時機：
+        - 每 flush_interval 秒一次
+        - 緩衝累積到 max_batch 筆時提早喚醒
+        - stop() 時寫入剩下的事件
+    """
+
+    def __init__(self, flush_interval: float = 1.0, max_batch: int = 500, max_buffer: int = 50000):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._written = 0
+        self._dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Event sink started (flush every {self.flush_interval}s or {self.max_batch} events)"
+        )
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """停止背景 thread 並寫入緩衝中剩下的事件"""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        thread.join(timeout)
+        self.flush()
+
+    def submit(self, rows: List[Dict[str, Any]]) -> None:
+        """把已 commit 的事件放進緩衝（任何 thread 都可以呼叫）"""
+        with self._lock:
+            self._buffer.extend(rows)
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                # DB 長時間寫不進去時保護記憶體：丟掉最舊的 audit 事件
+                del self._buffer[:overflow]
+                self._dropped += overflow
+                logger.warning(f"Event sink buffer full, dropped {overflow} oldest events")
+            size = len(self._buffer)
+        if not self.running:
+            # stop() 之後才 commit 的 transaction：直接同步寫入
+            self.flush()
+        elif size >= self.max_batch:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        把緩衝中的事件寫入資料庫
+
+        返回：
+            寫入的事件數量
+
+        注意：
+            - 整批寫入失敗時改為逐筆寫入，只丟掉真的寫不進去的事件（例如房間已被刪除）
+            - 連不上資料庫時整批放回緩衝，下次再試
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        written = 0
+        for start in range(0, len(rows), self.max_batch):
+            batch = rows[start:start + self.max_batch]
+            try:
+                written += self._insert(batch)
+                continue
+            except OperationalError as e:
+                kept_from, error = start, e
+            except Exception as e:
+                logger.warning(f"Bulk insert of {len(batch)} events failed, retrying one by one: {e}")
+                batch_written, processed, error = self._insert_each(batch)
+                written += batch_written
+                if error is None:
+                    continue
+                kept_from = start + processed
+            logger.error(f"Event sink flush failed, keeping {len(rows) - kept_from} events: {error}")
+            with self._lock:
+                self._buffer[:0] = rows[kept_from:]
+            break
+
+        self._written += written
+        return written
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "written": self._written, "dropped": self._dropped}
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> int:
+        db = SessionLocal()
+        try:
+            db.execute(insert(EventLog), rows)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_each(self, rows: List[Dict[str, Any]]) -> Tuple[int, int, Optional[Exception]]:
+        """
+        逐筆寫入，每筆各自一個 transaction
+        （不用 SAVEPOINT：pysqlite 預設的 transaction 處理下 SAVEPOINT 不可靠）
+
+        返回：
+            (寫入筆數, 處理過的筆數, 連線錯誤)；遇到 OperationalError（資料庫無法使用）就停下，
+            其餘寫不進去的事件直接丟掉
+        """
+        written = 0
+        db = SessionLocal()
+        try:
+            for processed, row in enumerate(rows):
+                try:
+                    db.execute(insert(EventLog), [row])
+                    db.commit()
+                    written += 1
+                except OperationalError as e:
+                    db.rollback()
+                    return written, processed, e
+                except Exception as e:
+                    db.rollback()
+                    self._dropped += 1
+                    logger.warning(f"Dropped {row['event_type']} event for room {row['room_id']}: {e}")
+            return written, len(rows), None
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Event sink flush failed: {e}", exc_info=True)
+
+
+event_sink = EventSink(
+    flush_interval=settings.event_sink_flush_seconds,
+    max_batch=settings.event_sink_max_batch
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_committed_events(session: Session) -> None:
+    pending = session.info.pop(_PENDING_BUFFERED_KEY, None)
+    if pending:
+        event_sink.submit(pending)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_events(session: Session, transaction) -> None:
+    # after_commit 已經取走；還留著代表外層 transaction 被 rollback 了
+    if transaction.parent is None:
+        session.info.pop(_PENDING_BUFFERED_KEY, None)
@@ -55,6 +55,11 @@ class InvalidStateTransition(ChickenGameException):
     pass
 
 
+class LockTimeout(ChickenGameException):
+    """等待房間鎖逾時（process 鎖後端）"""
+    pass
+
+
 # ============ Player 相關異常 ============
 
 class PlayerNotFound(ChickenGameException):
@@ -91,3 +96,14 @@ class IndicatorNotAssignedYet(ChickenGameException):
 class IndicatorsAlreadyAssigned(ChickenGameException):
     """指標已經分配過了"""
     pass
+
+
+# ============ 效能相關異常 ============
+
+class QueryBudgetExceeded(ChickenGameException):
+    """request 的 SQL 查詢數超過預算（query_budget_action=raise 時）"""
+    def __init__(self, route, statements, budget):
+        self.route = route
+        self.statements = statements
+        self.budget = budget
+        super().__init__(f"{route} exceeded its query budget ({statements} > {budget} statements)")
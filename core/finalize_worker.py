@@ -0,0 +1,204 @@
+"""
+Finalize Worker：在背景結算回合
+
+職責：
+1. 接收「這個回合所有人都交了」的通知（transaction commit 之後才入列）
+2. 以 round_id 去重，同一回合同時只會排一次
+3. 由少量 worker thread 呼叫 RoundManager.try_finalize_round()（沿用既有的 lock 與冪等設計）
+
+設計：
+- 最後一位提交的玩家只做「插入 Action + 計數器 + bump」，request 在常數時間內返回
+- 結算（Payoff 計算、狀態轉換）改在 worker thread 進行，不佔用 web worker
+- Worker 沒啟動時（腳本、測試），RoundManager 會退回同步結算
+- 結算失敗會重試幾次；try_finalize_round 是冪等的，重試與重複入列都安全
+- 重試用完（或 process 在結算前重啟、佇列遺失）的回合會停在 WAITING_ACTIONS：
+  啟動時與之後每 finalize_sweep_seconds 秒掃一次「全員已提交但未結算」的回合重新入列
+"""
+import logging
+import queue
+import threading
+import time
+from typing import List, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, settings
+from models import Round, RoundStatus
+
+logger = logging.getLogger(__name__)
+
+# Session.info key：這個 transaction commit 後要結算的 round_id
+_PENDING_FINALIZE_KEY = "pending_finalize_rounds"
+
+# 結算失敗時的重試次數與間隔
+FINALIZE_MAX_ATTEMPTS = 3
+FINALIZE_RETRY_DELAY_SECONDS = 0.5
+
+_STOP = object()
+
+
+class FinalizeWorker:
+    """
+    In-process 結算佇列 + worker pool
+
+    注意：
+        - enqueue() 可以從任何 thread 呼叫
+        - 同一個 round_id 在佇列中（尚未開始處理）時，重複 enqueue 會被忽略
+    """
+
+    def __init__(self, num_threads: int = 2, sweep_interval: float = 30.0):
+        self.num_threads = num_threads
+        self.sweep_interval = sweep_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._sweeper: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self) -> None:
+        if self._threads or self.num_threads <= 0:
+            return
+        for i in range(self.num_threads):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"finalize-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Finalize worker started with {self.num_threads} threads")
+
+        # 上一個 process 留下、還沒結算的回合
+        self._stopping.clear()
+        self.sweep()
+        if self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._run_sweeper, name="finalize-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """處理完已入列的工作後停止（佇列是 FIFO，停止訊號排在最後）"""
+        self._stopping.set()
+        sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            sweeper.join(timeout)
+
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, round_id: str) -> bool:
+        """
+        排入一個待結算的回合
+
+        返回：
+            False 如果同一回合已在佇列中（去重）
+        """
+        with self._lock:
+            if round_id in self._pending:
+                return False
+            self._pending.add(round_id)
+        self._queue.put(round_id)
+        return True
+
+    def enqueue_after_commit(self, db: Session, round_id: str) -> None:
+        """在 db 目前的 transaction commit 之後才排入（rollback 則丟棄）"""
+        db.info.setdefault(_PENDING_FINALIZE_KEY, set()).add(round_id)
+
+    def join(self) -> None:
+        """等待佇列中所有工作完成（測試與腳本用）"""
+        self._queue.join()
+
+    def sweep(self) -> int:
+        """
+        把「全員已提交但還沒結算」的回合重新入列
+
+        返回：
+            這次新排入的回合數（已在佇列中的不算）
+        """
+        db = SessionLocal()
+        try:
+            round_ids = db.execute(
+                select(Round.id).where(
+                    Round.status == RoundStatus.WAITING_ACTIONS,
+                    Round.result_calculated == False,
+                    Round.expected_actions > 0,
+                    Round.submitted_actions >= Round.expected_actions
+                )
+            ).scalars().all()
+        finally:
+            db.close()
+
+        enqueued = sum(1 for round_id in round_ids if self.enqueue(round_id))
+        if enqueued:
+            logger.warning(f"Finalize sweep re-enqueued {enqueued} unfinalized rounds")
+        return enqueued
+
+    def _run_sweeper(self) -> None:
+        while not self._stopping.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Finalize sweep failed: {e}", exc_info=True)
+
+    def _run(self) -> None:
+        while True:
+            round_id = self._queue.get()
+            try:
+                if round_id is _STOP:
+                    return
+                # 開始處理就移出去重集合：處理期間再有通知會重新入列，不會漏掉
+                with self._lock:
+                    self._pending.discard(round_id)
+                self._finalize(round_id)
+            finally:
+                self._queue.task_done()
+
+    def _finalize(self, round_id: str) -> None:
+        from core.round_manager import RoundManager  # 避免 circular import
+
+        for attempt in range(1, FINALIZE_MAX_ATTEMPTS + 1):
+            db = SessionLocal()
+            try:
+                finalized = RoundManager.try_finalize_round(db, round_id)
+                logger.info(f"Background finalize of round {round_id}: finalized={finalized}")
+                return
+            except Exception as e:
+                logger.error(
+                    f"Background finalize of round {round_id} failed "
+                    f"(attempt {attempt}/{FINALIZE_MAX_ATTEMPTS}): {e}",
+                    exc_info=True
+                )
+            finally:
+                db.close()
+            if attempt < FINALIZE_MAX_ATTEMPTS:
+                time.sleep(FINALIZE_RETRY_DELAY_SECONDS * attempt)
+
+        logger.error(f"Giving up on round {round_id} for now; the next sweep will re-enqueue it")
+
+
+finalize_worker = FinalizeWorker(
+    num_threads=settings.finalize_worker_threads,
+    sweep_interval=settings.finalize_sweep_seconds
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed_rounds(session: Session) -> None:
+    pending = session.info.pop(_PENDING_FINALIZE_KEY, None)
+    for round_id in pending or ():
+        finalize_worker.enqueue(round_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_rounds(session: Session, transaction) -> None:
+    # after_commit 已經取走；還留著代表外層 transaction 被 rollback 了
+    if transaction.parent is None:
+        session.info.pop(_PENDING_FINALIZE_KEY, None)
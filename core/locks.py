@@ -4,11 +4,145 @@
 提供 Database-level 的鎖定機制，防止競態條件（Race Condition）
 
 主要使用 PostgreSQL 的 SELECT ... FOR UPDATE 來實現悲觀鎖（Pessimistic Locking）
+
+鎖的後端（LOCK_BACKEND 設定）：
+- row：SELECT ... FOR UPDATE（PostgreSQL 等支援行級鎖的資料庫）
+- process：每個房間一把 process 內的鎖，transaction 結束時釋放
+  SQLite 會忽略 FOR UPDATE，用這個後端才能真的互斥；只適用單一 worker process
+- auto（預設）：SQLite 用 process，其他用 row
+
+process 後端的鎖以「房間」為單位：Round 的鎖就是它所屬房間的鎖，
+同一個 transaction 重複鎖定同一個房間不會卡住自己；不同房間互不影響。
 """
+import threading
+import weakref
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session, Query
 
+from core.exceptions import LockTimeout, RoundNotFound
+from database import engine, settings
 from models import Room, Round
 
+# Session.info key：這個 transaction 持有的房間鎖 {room_id: _RoomLock}
+_HELD_LOCKS_KEY = "held_room_locks"
+
+
+class RowLockBackend:
+    """SELECT ... FOR UPDATE：由資料庫負責鎖定"""
+
+    name = "row"
+
+    def lock_rooms(self, db: Session, room_ids: Iterable[str]) -> None:
+        pass
+
+    def lock_rounds(self, db: Session, round_ids: List[str]) -> None:
+        pass
+
+    def for_update(self, query: Query) -> Query:
+        return query.with_for_update(nowait=False)
+
+
+class _RoomLock:
+    """threading.Lock 不支援 weakref，包一層讓沒人使用的鎖可以被回收"""
+
+    __slots__ = ("lock", "__weakref__")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+class ProcessLockBackend:
+    """
+    每個房間一把 process 內的鎖（給沒有行級鎖的資料庫使用）
+
+    注意：
+        - 在讀取之前取得鎖，after_transaction_end（最外層）釋放
+        - 一次鎖多個房間時依 room_id 排序，避免 deadlock
+        - 等待超過 timeout 秒拋出 LockTimeout
+    """
+
+    name = "process"
+
+    # Round.room_id 不會改變，鎖 Round 時不用每次查它屬於哪個房間
+    ROUND_ROOMS_MAX = 10000
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._locks: "weakref.WeakValueDictionary[str, _RoomLock]" = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+        self._round_rooms: Dict[str, str] = {}
+
+    def lock_rooms(self, db: Session, room_ids: Iterable[str]) -> None:
+        # 先確保 transaction 已開始，鎖才會在 after_transaction_end 釋放
+        db.connection()
+        held: Dict[str, _RoomLock] = db.info.setdefault(_HELD_LOCKS_KEY, {})
+        for room_id in sorted(set(room_ids) - held.keys()):
+            with self._guard:
+                room_lock = self._locks.get(room_id)
+                if room_lock is None:
+                    room_lock = self._locks[room_id] = _RoomLock()
+            if not room_lock.lock.acquire(timeout=self.timeout):
+                raise LockTimeout(f"Timed out waiting for room {room_id} lock")
+            held[room_id] = room_lock
+
+    def lock_rounds(self, db: Session, round_ids: List[str]) -> None:
+        """
+        鎖定 Round 所屬的房間
+
+        異常：
+            RoundNotFound: 有 Round 查不到所屬房間（不會在沒有持有鎖的情況下返回）
+        """
+        with self._guard:
+            room_ids = {
+                round_id: self._round_rooms[round_id]
+                for round_id in round_ids if round_id in self._round_rooms
+            }
+        missing = [round_id for round_id in round_ids if round_id not in room_ids]
+        if missing:
+            found = dict(db.execute(
+                select(Round.id, Round.room_id).where(Round.id.in_(missing))
+            ).all())
+            room_ids.update(found)
+            with self._guard:
+                if len(self._round_rooms) > self.ROUND_ROOMS_MAX:
+                    self._round_rooms.clear()
+                self._round_rooms.update(found)
+            for round_id in missing:
+                if round_id not in found:
+                    raise RoundNotFound(round_id)
+        self.lock_rooms(db, room_ids.values())
+
+    def for_update(self, query: Query) -> Query:
+        return query
+
+    @staticmethod
+    def release(db: Session) -> None:
+        for room_lock in db.info.pop(_HELD_LOCKS_KEY, {}).values():
+            room_lock.lock.release()
+
+
+def _create_lock_backend():
+    backend = settings.lock_backend
+    if backend == "auto":
+        backend = "process" if engine.dialect.name == "sqlite" else "row"
+    if backend == "process":
+        return ProcessLockBackend(timeout=settings.lock_timeout_seconds)
+    if backend == "row":
+        return RowLockBackend()
+    raise ValueError(f"Unknown lock backend: {settings.lock_backend}")
+
+
+lock_backend = _create_lock_backend()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_room_locks(session: Session, transaction) -> None:
+    # commit 或 rollback 都會走到這裡；savepoint 結束不釋放
+    if transaction.parent is None and _HELD_LOCKS_KEY in session.info:
+        ProcessLockBackend.release(session)
+
 
 def with_room_lock(room_id: str, db: Session) -> Query:
     """
@@ -36,9 +170,10 @@ def with_room_lock(room_id: str, db: Session) -> Query:
         - nowait=False 表示如果鎖被佔用，會等待（避免 deadlock）
         - 必須在 transaction 內使用（確保有 commit 或 rollback）
     """
-    return db.query(Room).filter(
+    lock_backend.lock_rooms(db, [room_id])
+    return lock_backend.for_update(db.query(Room).filter(
         Room.id == room_id
-    ).with_for_update(nowait=False)
+    ))
 
 
 def with_round_lock(round_id: str, db: Session) -> Query:
@@ -63,10 +198,14 @@ def with_round_lock(round_id: str, db: Session) -> Query:
 
     返回：
         Query object（需要呼叫 .first() 或 .one() 來取得結果）
+
+    異常：
+        RoundNotFound: process 鎖後端找不到這個 Round（row 後端則是 .first() 返回 None）
     """
-    return db.query(Round).filter(
+    lock_backend.lock_rounds(db, [round_id])
+    return lock_backend.for_update(db.query(Round).filter(
         Round.id == round_id
-    ).with_for_update(nowait=False)
+    ))
 
 
 def lock_multiple_rounds(round_ids: list[str], db: Session) -> Query:
@@ -84,6 +223,7 @@ def lock_multiple_rounds(round_ids: list[str], db: Session) -> Query:
     返回：
         Query object（呼叫 .all() 取得所有結果）
     """
-    return db.query(Round).filter(
+    lock_backend.lock_rounds(db, round_ids)
+    return lock_backend.for_update(db.query(Round).filter(
         Round.id.in_(round_ids)
-    ).with_for_update(nowait=False)
+    ))
@@ -0,0 +1,184 @@
+"""
+SQL 查詢統計：每個 request 的查詢數與 DB 時間
+
+職責：
+1. SQLAlchemy cursor 事件（所有 Engine，包含 async engine 底下的 sync engine）累計目前 request 的查詢數與 DB 時間
+2. QueryStatsMiddleware 把結果放進 response header（Server-Timing、X-Query-Count），並依 route 彙總
+3. 查詢預算：查詢數超過上限時記錄 warning，或（query_budget_action=raise）在第 N+1 條查詢直接拋出
+   QueryBudgetExceeded，讓 CI 在 N+1 查詢上線前就失敗
+
+request 的歸屬用 contextvars：threadpool 執行的 sync endpoint、async engine 的 greenlet 都會繼承
+request 的 context；背景 thread（finalize_worker、event_sink）不會算進任何 request。
+
+注意：
+- header 在 response 開始時送出，StreamingResponse（SSE）的 header 只算到送出 header 為止，
+  route 彙總則包含整個 response
+- WebSocket 連線不統計（連線期間很長，單次的查詢數沒有意義）
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from core.exceptions import QueryBudgetExceeded
+from database import settings
+
+logger = logging.getLogger(__name__)
+
+# 目前 request 的統計（request 以外為 None）
+_current_stats: ContextVar[Optional["RequestQueryStats"]] = ContextVar("query_stats", default=None)
+
+# ExecutionContext 上記錄查詢開始時間的屬性
+_STARTED_ATTR = "_query_stats_started"
+
+
+class RequestQueryStats:
+    """單一 request 的查詢數與 DB 時間"""
+
+    __slots__ = ("scope", "started", "statements", "db_time")
+
+    def __init__(self, scope: Dict[str, Any]):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        """ "METHOD path"；path 是 route 的樣板（/api/rooms/{room_id}/state），還沒 routing 或沒有符合的 route 時為 unmatched"""
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        return f"{self.scope['method']} {path}"
+
+    @property
+    def budget(self) -> int:
+        return settings.query_budget_routes.get(self.route, settings.query_budget)
+
+    def over_budget(self) -> bool:
+        return 0 < self.budget < self.statements
+
+    def server_timing(self) -> str:
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries", '
+            f"app;dur={total_ms:.1f}"
+        )
+
+
+class RouteQueryStats:
+    """一個 route 累計的統計"""
+
+    __slots__ = ("requests", "statements", "db_time", "max_statements", "over_budget")
+
+    def __init__(self):
+        self.requests = 0
+        self.statements = 0
+        self.db_time = 0.0
+        self.max_statements = 0
+        self.over_budget = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "statements": self.statements,
+            "avg_statements": round(self.statements / self.requests, 2) if self.requests else 0,
+            "max_statements": self.max_statements,
+            "db_time_ms": round(self.db_time * 1000, 1),
+            "over_budget": self.over_budget,
+        }
+
+
+class QueryStatsRegistry:
+    """依 route 彙總的統計（process 內）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, RouteQueryStats] = {}
+
+    def record(self, stats: RequestQueryStats) -> None:
+        route = stats.route
+        with self._lock:
+            totals = self._routes.get(route)
+            if totals is None:
+                totals = self._routes[route] = RouteQueryStats()
+            totals.requests += 1
+            totals.statements += stats.statements
+            totals.db_time += stats.db_time
+            totals.max_statements = max(totals.max_statements, stats.statements)
+            if stats.over_budget():
+                totals.over_budget += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {route: totals.as_dict() for route, totals in sorted(self._routes.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+query_stats = QueryStatsRegistry()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    if settings.query_budget_action == "raise" and stats.over_budget():
+        raise QueryBudgetExceeded(stats.route, stats.statements, stats.budget)
+    if context is not None:
+        setattr(context, _STARTED_ATTR, time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_stats.get()
+    started = getattr(context, _STARTED_ATTR, None)
+    if stats is not None and started is not None:
+        stats.db_time += time.perf_counter() - started
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware：統計每個 HTTP request 的 SQL 查詢
+
+    response header：
+        Server-Timing: db;dur=<ms>;desc="<N> queries", app;dur=<ms>
+        X-Query-Count: <N>
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+                headers["X-Query-Count"] = str(stats.statements)
+            await send(message)
+
+        token = _current_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            query_stats.record(stats)
+            if stats.over_budget() and settings.query_budget_action != "raise":
+                logger.warning(
+                    "%s ran %d SQL statements (budget %d, %.1f ms in DB)",
+                    stats.route, stats.statements, stats.budget, stats.db_time * 1000
+                )
@@ -12,12 +12,14 @@ Linus 原則：
 - 消除特殊情況：所有狀態變更經過 StateMachine
 - 資料結構優先：先檢查資料是否符合要求，再執行操作
 """
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Tuple
+from typing import Optional, Tuple
 import logging
 
-from models import Room, Player, RoomStatus, EventLog
+from models import Room, Player, RoomStatus
 from core.state_machine import RoomStateMachine
+from core.event_sink import record_event
 from core.locks import with_room_lock
 from core.exceptions import (
     RoomNotFound,
@@ -79,12 +81,7 @@ class RoomManager:
         db.add(host)
 
         # 4. 記錄事件
-        event = EventLog(
-            room_id=room.id,
-            event_type="ROOM_CREATED",
-            data={"code": code}
-        )
-        db.add(event)
+        record_event(db, room.id, "ROOM_CREATED", {"code": code})
 
         # transactional decorator 會自動 commit
         return room, host
@@ -144,12 +141,7 @@ class RoomManager:
         room = RoomStateMachine.transition(room_id, RoomStatus.PLAYING, db)
 
         # 4. 記錄遊戲開始事件
-        event = EventLog(
-            room_id=room_id,
-            event_type="GAME_STARTED",
-            data={"player_count": player_count}
-        )
-        db.add(event)
+        record_event(db, room_id, "GAME_STARTED", {"player_count": player_count})
 
         bump_state_version(db, room_id, reason="game_started")
 
@@ -220,12 +212,7 @@ class RoomManager:
         room = RoomStateMachine.transition(room_id, RoomStatus.PLAYING, db)
 
         # 4. 記錄遊戲開始事件
-        event = EventLog(
-            room_id=room_id,
-            event_type="GAME_STARTED",
-            data={"player_count": player_count}
-        )
-        db.add(event)
+        record_event(db, room_id, "GAME_STARTED", {"player_count": player_count})
 
         # === create_round 的邏輯 ===
 
@@ -250,24 +237,22 @@ class RoomManager:
         db.add(new_round)
         db.flush()  # 取得 round ID
 
-        # 8. 建立配對
+        # 8. 建立整場遊戲的配對（之後的回合沿用，不再複製）
         try:
             pairs = create_pairs_for_round(room_id, new_round.id, db)
             logger.info(f"Created {len(pairs)} pairs for round {new_round.id}")
         except ValueError as e:
             raise InvalidPlayerCount(str(e))
 
+        # 每個配對兩位玩家都要提交
+        new_round.expected_actions = len(pairs) * 2
+
         # 9. 記錄回合建立事件
-        round_event = EventLog(
-            room_id=room_id,
-            event_type="ROUND_CREATED",
-            data={
-                "round_id": str(new_round.id),
-                "round_number": round_number,
-                "phase": phase.value
-            }
-        )
-        db.add(round_event)
+        record_event(db, room_id, "ROUND_CREATED", {
+            "round_id": str(new_round.id),
+            "round_number": round_number,
+            "phase": phase.value
+        })
 
         bump_state_version(db, room_id, reason="game_started_round_created")
 
@@ -305,12 +290,7 @@ class RoomManager:
         logger.info(f"Game ended for room {room_id}")
 
         # 2. 記錄遊戲結束事件
-        event = EventLog(
-            room_id=room_id,
-            event_type="GAME_ENDED",
-            data={}
-        )
-        db.add(event)
+        record_event(db, room_id, "GAME_ENDED", {})
 
         bump_state_version(db, room_id, reason="game_ended")
 
@@ -372,3 +352,24 @@ class RoomManager:
             Player.room_id == room_id,
             Player.is_host == False
         ).count()
+
+    @staticmethod
+    def room_has_player(db: Session, room_id: str, player_id: Optional[str] = None) -> bool:
+        """
+        房間存在（有給 player_id 時，玩家也屬於這個房間）
+
+        只做主鍵查詢、不載入物件；immutable ETag 命中回 304 之前用它確認資源還在，
+        房間被刪除或 player_id 不對時要照常回 404
+
+        參數：
+            db: SQLAlchemy Session
+            room_id: Room UUID
+            player_id: Player UUID（可選）
+
+        返回：
+            True 如果房間（與玩家）存在
+        """
+        stmt = select(Room.id).where(Room.id == room_id)
+        if player_id is not None:
+            stmt = stmt.join(Player, Player.room_id == Room.id).where(Player.id == player_id)
+        return db.execute(stmt.limit(1)).first() is not None
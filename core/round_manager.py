@@ -12,15 +12,19 @@ Linus 原則：
 - 並發安全：使用 DB lock 確保不會重複計算
 - 冪等性：同一個動作提交多次，只會生效一次
 """
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import Optional
 import logging
 
 from models import (
-    Room, Round, Action, Choice, RoundStatus, RoundPhase, EventLog
+    Room, Round, Action, Choice, RoundStatus, RoundPhase
 )
 from core.state_machine import RoundStateMachine
+from core.finalize_worker import finalize_worker
+from core.event_sink import record_event
 from core.locks import with_room_lock, with_round_lock
 from core.exceptions import (
     RoomNotFound,
@@ -32,11 +36,12 @@ from core.exceptions import (
 )
 from services.pairing_service import (
     create_pairs_for_round,
-    copy_pairs_from_round
+    count_room_pairs
 )
 from services.payoff_service import (
     calculate_round_payoffs,
-    all_actions_submitted
+    all_actions_submitted,
+    get_unsubmitted_player_ids
 )
 from services.round_phase_service import get_round_phase
 from services.state_service import bump_state_version
@@ -44,6 +49,12 @@ from database import transactional
 
 logger = logging.getLogger(__name__)
 
+# 支援 INSERT ... ON CONFLICT DO NOTHING 的資料庫（dialect.name -> insert 建構函式）
+_CONFLICT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
 
 class RoundManager:
     """Round 生命週期管理器"""
@@ -64,7 +75,7 @@ class RoundManager:
         2. 檢查前置條件
         3. Room.current_round += 1
         4. 建立 Round
-        5. 建立配對（Pairs）
+        5. Round 1 建立配對（Pairs），之後的回合沿用房間的配對
         6. 記錄事件
 
         參數：
@@ -110,41 +121,28 @@ class RoundManager:
         db.add(new_round)
         db.flush()  # 取得 round ID
 
-        # 6. 建立配對（Round 1 隨機、之後沿用 Round 1 配對）
+        # 6. 配對：Round 1 建立整場遊戲的配對，之後的回合直接沿用（不複製）
         try:
             if round_number == 1:
-                pairs = create_pairs_for_round(room_id, new_round.id, db)
+                pair_count = len(create_pairs_for_round(room_id, new_round.id, db))
+                logger.info(f"Created {pair_count} pairs for room {room_id}")
             else:
-                # 使用 Round 1 的配對固定對手
-                first_round = db.query(Round).filter(
-                    Round.room_id == room_id,
-                    Round.round_number == 1
-                ).first()
-                if not first_round:
-                    raise ValueError("Round 1 not found to reuse pairs from")
-
-                pairs = copy_pairs_from_round(
-                    room_id=room_id,
-                    source_round_id=first_round.id,
-                    target_round_id=new_round.id,
-                    db=db
-                )
-            logger.info(f"Created {len(pairs)} pairs for round {new_round.id}")
+                pair_count = count_room_pairs(room_id, db)
+                if not pair_count:
+                    raise ValueError(f"No pairs found for room {room_id} to reuse")
         except ValueError as e:
             # 玩家數量不是偶數
             raise InvalidPlayerCount(str(e))
 
+        # 每個配對兩位玩家都要提交
+        new_round.expected_actions = pair_count * 2
+
         # 7. 記錄事件
-        event = EventLog(
-            room_id=room_id,
-            event_type="ROUND_CREATED",
-            data={
-                "round_id": str(new_round.id),
-                "round_number": round_number,
-                "phase": phase.value
-            }
-        )
-        db.add(event)
+        record_event(db, room_id, "ROUND_CREATED", {
+            "round_id": str(new_round.id),
+            "round_number": round_number,
+            "phase": phase.value
+        })
 
         bump_state_version(db, room_id, reason="round_created")
 
@@ -167,8 +165,8 @@ class RoundManager:
 
         流程：
         1. 檢查 Round 是否存在
-        2. 嘗試插入 Action
-        3. 如果違反 unique constraint，查詢並返回既有 Action
+        2. 插入 Action（ON CONFLICT DO NOTHING，不需要 rollback）
+        3. 如果已經存在，查詢並返回既有 Action
 
         參數：
             db: SQLAlchemy Session
@@ -193,43 +191,22 @@ class RoundManager:
             f"Submitting action for player {player_id} in round {round_id}: {choice.value}"
         )
 
-        # 2. 嘗試建立 Action
-        action = Action(
-            room_id=round_obj.room_id,
-            round_id=round_id,
-            player_id=player_id,
-            choice=choice
-        )
-        db.add(action)
-
-        created_new = True
-        try:
-            db.flush()  # 觸發 unique constraint 檢查
-            logger.info(f"Action created for player {player_id}")
-        except IntegrityError:
-            # 違反 unique constraint：玩家已經提交過
-            logger.info(f"Action already exists for player {player_id}, returning existing")
-            db.rollback()
-
-            # 查詢既有的 Action
-            existing_action = db.query(Action).filter(
-                Action.round_id == round_id,
-                Action.player_id == player_id
-            ).first()
+        # 2. 插入 Action（冪等：已提交過則返回既有 Action）
+        action, created_new = RoundManager._insert_action(db, round_obj, player_id, choice)
 
-            if not existing_action:
-                # 理論上不應該發生（IntegrityError 表示有重複）
-                logger.error(
-                    f"IntegrityError but no existing action found: "
-                    f"round={round_id}, player={player_id}"
-                )
-                raise
+        if created_new:
+            RoundManager._count_submitted_action(db, round_obj)
 
-            action = existing_action
-            created_new = False
+            # 只通知「誰交了」，不洩漏選擇內容
+            record_event(db, round_obj.room_id, "ACTION_SUBMITTED", {
+                "round_id": str(round_id),
+                "round_number": round_obj.round_number,
+                "player_id": str(player_id)
+            })
 
-        # action 新增或既有都代表目前狀態對前端有意義（提交進度）
-        bump_state_version(db, round_obj.room_id, reason="action_submitted")
+        # 重複提交不會改變任何前端看得到的東西，不 bump（避免整個房間重建快照）
+        if created_new:
+            bump_state_version(db, round_obj.room_id, reason="action_submitted")
 
         return action, created_new
 
@@ -268,7 +245,10 @@ class RoundManager:
         - 冪等性：多次呼叫效果相同
         """
         # 1. 鎖定 Round（防止並發結算）
-        round_obj = with_round_lock(round_id, db).first()
+        try:
+            round_obj = with_round_lock(round_id, db).first()
+        except RoundNotFound:
+            round_obj = None
         if not round_obj:
             logger.warning(f"Round {round_id} not found")
             return False
@@ -278,45 +258,210 @@ class RoundManager:
             logger.info(f"Round {round_id} already finalized")
             return True
 
-        # 3. 檢查是否所有玩家都提交了動作
-        if not all_actions_submitted(round_id, db):
+        # 3-8. 檢查、計算、狀態轉換、記錄事件
+        if not RoundManager._finalize_locked_round(db, round_obj):
+            return False
+
+        bump_state_version(db, round_obj.room_id, reason="round_ready_to_publish")
+        return True
+
+    @staticmethod
+    @transactional
+    def submit_and_try_finalize(
+        db: Session,
+        round_id: str,
+        player_id: str,
+        choice: Choice
+    ) -> tuple[Action, bool, bool]:
+        """
+        提交玩家動作，並在所有人都提交後結算
+
+        等同於依序呼叫 submit_action() 與 try_finalize_round()，但：
+        - 只有一個 transaction（一次 commit）
+        - 每個 row 只鎖一次：Round 在開頭鎖定後一路沿用，Room 只在最後 bump 時鎖定
+        - state_version 最多 bump 一次（commit 時合併）
+
+        流程：
+        1. 鎖定 Round
+        2. 插入 Action（冪等：重複提交返回既有 Action）
+        3. 尚未結算且所有人都提交了：
+           - finalize_worker 在跑 → commit 後排入背景結算（request 不等待）
+           - 否則 → 直接在這個 transaction 內計算結果、停在 READY_TO_PUBLISH
+        4. bump state_version（有新 Action 或本次結算時）
+
+        參數：
+            db: SQLAlchemy Session
+            round_id: Round UUID
+            player_id: Player UUID
+            choice: 玩家選擇（TURN 或 ACCELERATE）
+
+        返回：
+            (Action, created_new, finalized) tuple
+            finalized: 回合結果是否已計算（本次或先前；交給背景結算時為 False）
+
+        注意：
+            - 鎖定順序 Round → Room，與 try_finalize_round() 相同
+            - 重複提交不會 rollback，Round 的鎖一路保留到 commit
+        """
+        # 1. 鎖定 Round（同一回合的提交在這裡排隊，最後一個拿到鎖的人一定看得到所有 Action）
+        round_obj = with_round_lock(round_id, db).first()
+        if not round_obj:
+            raise RoundNotFound(round_id)
+
+        logger.info(
+            f"Submitting action for player {player_id} in round {round_id}: {choice.value}"
+        )
+
+        # 2. 插入 Action（冪等：已提交過則返回既有 Action）
+        action, created_new = RoundManager._insert_action(db, round_obj, player_id, choice)
+
+        if created_new:
+            RoundManager._count_submitted_action(db, round_obj)
+
+            # 只通知「誰交了」，不洩漏選擇內容
+            record_event(db, round_obj.room_id, "ACTION_SUBMITTED", {
+                "round_id": str(round_id),
+                "round_number": round_obj.round_number,
+                "player_id": str(player_id)
+            })
+
+        # 3. 嘗試結算（沿用已鎖定的 Round）
+        #    背景 worker 在跑時只排入佇列（commit 後），request 不等結算
+        just_finalized = False
+        if not round_obj.result_calculated:
+            if finalize_worker.running:
+                if all_actions_submitted(round_id, db, round_obj=round_obj):
+                    finalize_worker.enqueue_after_commit(db, round_id)
+            else:
+                just_finalized = RoundManager._finalize_locked_round(db, round_obj)
+
+        # 4. bump state_version（重複提交且沒有結算 = 沒有可見變化，不 bump）
+        if created_new:
+            bump_state_version(db, round_obj.room_id, reason="action_submitted")
+        if just_finalized:
+            bump_state_version(db, round_obj.room_id, reason="round_ready_to_publish")
+
+        return action, created_new, round_obj.result_calculated
+
+    @staticmethod
+    def _insert_action(
+        db: Session,
+        round_obj: Round,
+        player_id: str,
+        choice: Choice
+    ) -> tuple[Action, bool]:
+        """
+        插入 Action（冪等），不 commit
+
+        - SQLite / PostgreSQL：INSERT ... ON CONFLICT (round_id, player_id) DO NOTHING RETURNING，
+          新提交只需要一個 statement；重複提交不會觸發 IntegrityError，再查一次既有 Action
+        - 其他資料庫：在 SAVEPOINT 內 flush，衝突時只 rollback 到 savepoint（外層 transaction 與鎖都保留）
+
+        返回：
+            (Action, created_new) tuple
+        """
+        values = {
+            "room_id": round_obj.room_id,
+            "round_id": round_obj.id,
+            "player_id": player_id,
+            "choice": choice
+        }
+
+        dialect = db.get_bind().dialect
+        conflict_insert = _CONFLICT_INSERTS.get(dialect.name)
+        if conflict_insert is not None and dialect.insert_returning:
+            action = db.scalars(
+                conflict_insert(Action)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=["round_id", "player_id"])
+                .returning(Action)
+            ).first()
+        else:
+            action = Action(**values)
+            try:
+                with db.begin_nested():
+                    db.add(action)
+            except IntegrityError:
+                action = None
+
+        if action is not None:
+            logger.info(f"Action created for player {player_id}")
+            return action, True
+
+        logger.info(f"Action already exists for player {player_id}, returning existing")
+        existing_action = db.query(Action).filter(
+            Action.round_id == round_obj.id,
+            Action.player_id == player_id
+        ).first()
+        if not existing_action:
+            # 理論上不應該發生（衝突表示已有同一玩家的 Action）
+            logger.error(
+                f"Conflicting action not found: round={round_obj.id}, player={player_id}"
+            )
+            raise ActionAlreadySubmitted(
+                f"Action for player {player_id} in round {round_obj.id} conflicts but was not found"
+            )
+        return existing_action, False
+
+    @staticmethod
+    def _count_submitted_action(db: Session, round_obj: Round) -> None:
+        """
+        Round.submitted_actions += 1（在 DB 端原子遞增）
+
+        用 SQL 表達式而非讀出來再寫回：並發提交不會互相覆蓋計數。
+        flush 後屬性會過期，下次讀取時重新載入最新值。
+        """
+        round_obj.submitted_actions = Round.submitted_actions + 1
+        db.flush()
+
+    @staticmethod
+    def _finalize_locked_round(db: Session, round_obj: Round) -> bool:
+        """
+        計算已鎖定、尚未結算的 Round 的結果（不 bump、不 commit）
+
+        前置條件：
+            呼叫端已在同一個 transaction 內用 with_round_lock 鎖定 round_obj，
+            且 round_obj.result_calculated 為 False
+
+        返回：
+            True 如果已結算，False 如果還有玩家未提交
+        """
+        round_id = round_obj.id
+
+        # 檢查是否所有玩家都提交了動作
+        if not all_actions_submitted(round_id, db, round_obj=round_obj):
             logger.info(f"Round {round_id} not all actions submitted yet")
             return False
 
         logger.info(f"Calculating round {round_id} results (room={round_obj.room_id}, round_number={round_obj.round_number})")
 
-        # 4. 狀態轉換：WAITING_ACTIONS -> CALCULATING
-        round_obj = RoundStateMachine.transition(
+        # 狀態轉換：WAITING_ACTIONS -> CALCULATING
+        RoundStateMachine.transition(
             round_id,
             RoundStatus.CALCULATING,
-            db
+            db,
+            locked_round=round_obj
         )
 
-        # 5. 計算 Payoff
+        # 計算 Payoff
         calculate_round_payoffs(round_id, db)
 
-        # 6. 標記為已計算（防止重複計算的關鍵！）
+        # 標記為已計算（防止重複計算的關鍵！）
         round_obj.result_calculated = True
 
-        # 7. 狀態轉換：CALCULATING -> READY_TO_PUBLISH（停在這裡，等待管理員公布）
-        round_obj = RoundStateMachine.transition(
+        # 狀態轉換：CALCULATING -> READY_TO_PUBLISH（停在這裡，等待管理員公布）
+        RoundStateMachine.transition(
             round_id,
             RoundStatus.READY_TO_PUBLISH,
-            db
+            db,
+            locked_round=round_obj
         )
 
-        # 8. 記錄事件
-        event = EventLog(
-            room_id=round_obj.room_id,
-            event_type="ROUND_CALCULATED",
-            data={
-                "round_id": str(round_id),
-                "round_number": round_obj.round_number
-            }
-        )
-        db.add(event)
-
-        bump_state_version(db, round_obj.room_id, reason="round_ready_to_publish")
+        # 記錄事件
+        record_event(db, round_obj.room_id, "ROUND_CALCULATED", {
+            "round_id": str(round_id),
+            "round_number": round_obj.round_number
+        })
 
         logger.info(f"Round {round_id} calculated, waiting for publish")
         return True
@@ -364,30 +509,120 @@ class RoundManager:
                 f"Cannot publish round in status {round_obj.status.value}"
             )
 
+        # 4-5. 狀態轉換 READY_TO_PUBLISH -> COMPLETED、記錄事件
+        RoundManager._publish_locked_round(db, round_obj)
+
+        bump_state_version(db, round_obj.room_id, reason="round_published")
+
+        logger.info(f"Round {round_id} published successfully")
+        return round_obj
+
+    @staticmethod
+    @transactional
+    def skip_round(db: Session, round_id: str) -> Round:
+        """
+        跳過回合：未提交的玩家一律視為 TURN，結算並立即公布
+
+        與逐一呼叫 submit_action() + try_finalize_round() + publish_round() 的差別：
+        - 只有一個 transaction、Round 只鎖一次
+        - 缺少的 Action 用一次查詢找出、一次 bulk INSERT 補齊（不是每位玩家一次 SELECT + commit）
+        - state_version 只 bump 一次
+
+        流程：
+        1. 鎖定 Round
+        2. 檢查狀態（只能跳過 WAITING_ACTIONS 或 READY_TO_PUBLISH）
+        3. 尚未結算：補齊缺少的 Action、更新計數器、結算
+        4. 公布（READY_TO_PUBLISH -> COMPLETED）
+        5. bump state_version
+
+        參數：
+            db: SQLAlchemy Session
+            round_id: Round UUID
+
+        返回：
+            公布後的 Round
+
+        注意：
+            - 冪等：已經是 COMPLETED 時直接返回
+            - 其他狀態拋出 InvalidStateTransition
+        """
+        # 1. 鎖定 Round（與 submit_and_try_finalize 相同，提交會在這裡排隊）
+        round_obj = with_round_lock(round_id, db).first()
+        if not round_obj:
+            raise RoundNotFound(round_id)
+
+        # 2. 檢查狀態
+        if round_obj.status == RoundStatus.COMPLETED:
+            logger.info(f"Round {round_id} already published")
+            return round_obj
+        if round_obj.status not in (RoundStatus.WAITING_ACTIONS, RoundStatus.READY_TO_PUBLISH):
+            raise InvalidStateTransition(
+                f"Cannot skip round in status {round_obj.status.value}"
+            )
+
+        logger.info(f"Skipping round {round_id} (room={round_obj.room_id}, round_number={round_obj.round_number})")
+
+        # 3. 補齊缺少的 Action 並結算
+        if not round_obj.result_calculated:
+            missing = get_unsubmitted_player_ids(round_id, db)
+            if missing:
+                logger.info(f"Auto-submitting TURN for {len(missing)} players in round {round_id}")
+                db.execute(insert(Action), [
+                    {
+                        "room_id": round_obj.room_id,
+                        "round_id": round_id,
+                        "player_id": player_id,
+                        "choice": Choice.TURN
+                    }
+                    for player_id in missing
+                ])
+                round_obj.submitted_actions = Round.submitted_actions + len(missing)
+                db.flush()
+
+                for player_id in missing:
+                    record_event(db, round_obj.room_id, "ACTION_SUBMITTED", {
+                        "round_id": str(round_id),
+                        "round_number": round_obj.round_number,
+                        "player_id": str(player_id)
+                    })
+
+            if not RoundManager._finalize_locked_round(db, round_obj):
+                # 補齊之後仍未齊全，代表計數器與實際資料不一致（見 utils/round_counters.py）
+                raise InvalidStateTransition(
+                    f"Round {round_id} still has missing actions after skip"
+                )
+
+        # 4. 公布
+        RoundManager._publish_locked_round(db, round_obj)
+
+        # 5. 一次 bump（補交、結算、公布合併成一個版本）
+        bump_state_version(db, round_obj.room_id, reason="round_skipped")
+
+        logger.info(f"Round {round_id} skipped and published")
+        return round_obj
+
+    @staticmethod
+    def _publish_locked_round(db: Session, round_obj: Round) -> None:
+        """
+        公布已鎖定、狀態為 READY_TO_PUBLISH 的 Round（不 bump、不 commit）
+        """
+        round_id = round_obj.id
+
         logger.info(f"Publishing round {round_id} (room={round_obj.room_id}, round_number={round_obj.round_number})")
 
-        # 4. 狀態轉換：READY_TO_PUBLISH -> COMPLETED
-        round_obj = RoundStateMachine.transition(
+        # 狀態轉換：READY_TO_PUBLISH -> COMPLETED
+        RoundStateMachine.transition(
             round_id,
             RoundStatus.COMPLETED,
-            db
-        )
-
-        # 5. 記錄事件
-        event = EventLog(
-            room_id=round_obj.room_id,
-            event_type="ROUND_PUBLISHED",
-            data={
-                "round_id": str(round_id),
-                "round_number": round_obj.round_number
-            }
+            db,
+            locked_round=round_obj
         )
-        db.add(event)
 
-        bump_state_version(db, round_obj.room_id, reason="round_published")
-
-        logger.info(f"Round {round_id} published successfully")
-        return round_obj
+        # 記錄事件
+        record_event(db, round_obj.room_id, "ROUND_PUBLISHED", {
+            "round_id": str(round_id),
+            "round_number": round_obj.round_number
+        })
 
     @staticmethod
     def get_round_by_number(
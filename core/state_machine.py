@@ -13,10 +13,12 @@ Linus 原則：
 """
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
 import logging
 
-from models import Room, Round, RoomStatus, RoundStatus, EventLog
+from models import Room, Round, RoomStatus, RoundStatus
 from core.locks import with_room_lock, with_round_lock
+from core.event_sink import record_event
 from core.exceptions import (
     RoomNotFound,
     RoundNotFound,
@@ -109,16 +111,11 @@ class RoomStateMachine:
         room.updated_at = datetime.utcnow()
 
         # 4. 記錄 Event Log（用於 audit trail 和事件補發）
-        event = EventLog(
-            room_id=room_id,
-            event_type="ROOM_STATE_CHANGED",
-            data={
-                "from": from_status.value,
-                "to": to_status.value,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
-        db.add(event)
+        record_event(db, room_id, "ROOM_STATE_CHANGED", {
+            "from": from_status.value,
+            "to": to_status.value,
+            "timestamp": datetime.utcnow().isoformat()
+        })
 
         # 5. 不要在這裡 commit，讓外層的 transaction 處理
         return room
@@ -163,7 +160,12 @@ class RoundStateMachine:
         return to_status in RoundStateMachine.VALID_TRANSITIONS.get(from_status, [])
 
     @staticmethod
-    def transition(round_id: str, to_status: RoundStatus, db: Session) -> Round:
+    def transition(
+        round_id: str,
+        to_status: RoundStatus,
+        db: Session,
+        locked_round: Optional[Round] = None
+    ) -> Round:
         """
         執行狀態轉換（唯一修改 Round.status 的地方）
 
@@ -178,6 +180,8 @@ class RoundStateMachine:
             round_id: Round 的 UUID
             to_status: 目標狀態
             db: SQLAlchemy Session
+            locked_round: 呼叫端在同一個 transaction 內已經用 with_round_lock 鎖住的 Round
+                          （傳入時不再重複鎖定）
 
         返回：
             更新後的 Round object
@@ -186,8 +190,10 @@ class RoundStateMachine:
             RoundNotFound: Round 不存在
             InvalidStateTransition: 非法的狀態轉換
         """
-        # 1. 鎖定 Round
-        round_obj = with_round_lock(round_id, db).first()
+        # 1. 鎖定 Round（呼叫端已持有鎖就直接使用）
+        round_obj = locked_round
+        if round_obj is None:
+            round_obj = with_round_lock(round_id, db).first()
         if not round_obj:
             raise RoundNotFound(round_id)
 
@@ -216,17 +222,12 @@ class RoundStateMachine:
             round_obj.ended_at = datetime.utcnow()
 
         # 6. 記錄 Event Log
-        event = EventLog(
-            room_id=round_obj.room_id,
-            event_type="ROUND_STATE_CHANGED",
-            data={
-                "round_id": str(round_id),
-                "round_number": round_obj.round_number,
-                "from": from_status.value,
-                "to": to_status.value,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
-        db.add(event)
+        record_event(db, round_obj.room_id, "ROUND_STATE_CHANGED", {
+            "round_id": str(round_id),
+            "round_number": round_obj.round_number,
+            "from": from_status.value,
+            "to": to_status.value,
+            "timestamp": datetime.utcnow().isoformat()
+        })
 
         return round_obj
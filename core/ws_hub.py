@@ -0,0 +1,184 @@
+"""
+WebSocket Hub：把 commit 後的 EventLog 推送給訂閱同一房間的連線
+
+流程：
+1. RoomManager / RoundManager 照常寫入 EventLog
+2. Session after_flush 收集要推送的 EventLog（此時已有自增 id）
+3. Session after_commit 把事件交給 Hub（只做 call_soon_threadsafe，不佔 request thread）
+4. Hub 在 event loop 上 fan-out 到每個連線的 bounded queue
+
+斷線重連：
+- 客戶端帶上最後收到的 event_id，先用 /events/since 的語意補發，再接上即時事件
+- 慢速連線的 queue 滿了就直接斷線，由客戶端重連補發（不拖慢其他連線）
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import EventLog
+from schemas import WSEvent, WSEventType
+
+logger = logging.getLogger(__name__)
+
+# 每個連線最多暫存的事件數量（超過視為慢速連線，斷線處理）
+WS_QUEUE_SIZE = 256
+
+# 與 /events/since 相同的單次查詢上限
+EVENTS_PAGE_SIZE = 100
+
+# Session.info key：這個 transaction 內 flush 出去、待推送的 EventLog
+_PENDING_EVENTS_KEY = "pending_ws_events"
+
+# EventLog.event_type -> WSEventType（沒有列出的事件不推送）
+EVENT_TYPE_MAP = {
+    "GAME_STARTED": WSEventType.ROOM_STARTED,
+    "ROUND_CREATED": WSEventType.ROUND_STARTED,
+    "ACTION_SUBMITTED": WSEventType.ACTION_SUBMITTED,
+    "ROUND_CALCULATED": WSEventType.ROUND_READY,
+    "ROUND_PUBLISHED": WSEventType.ROUND_ENDED,
+    "INDICATORS_ASSIGNED": WSEventType.INDICATORS_ASSIGNED,
+    "GAME_ENDED": WSEventType.GAME_ENDED,
+}
+
+
+def to_ws_events(event_id: int, room_id: str, event_type: str, data: Optional[dict]) -> List[WSEvent]:
+    """
+    把一筆 EventLog 轉成要推送的 WSEvent（可能 0 筆或多筆）
+
+    ROUND_CREATED 在訊息回合會額外送出 MESSAGE_PHASE。
+    """
+    ws_type = EVENT_TYPE_MAP.get(event_type)
+    if ws_type is None:
+        return []
+
+    events = [WSEvent(event_id=event_id, event_type=ws_type, room_id=room_id, data=data or {})]
+    if event_type == "ROUND_CREATED" and (data or {}).get("phase") == "MESSAGE":
+        events.append(WSEvent(
+            event_id=event_id,
+            event_type=WSEventType.MESSAGE_PHASE,
+            room_id=room_id,
+            data=data
+        ))
+    return events
+
+
+def fetch_events_since(db: Session, room_id: str, last_event_id: int, limit: int = EVENTS_PAGE_SIZE) -> List[EventLog]:
+    """取得 event_id > last_event_id 的事件（依 id 排序，最多 limit 筆）"""
+    return db.query(EventLog).filter(
+        EventLog.room_id == room_id,
+        EventLog.id > last_event_id
+    ).order_by(EventLog.id).limit(limit).all()
+
+
+class Subscription:
+    """單一 WebSocket 連線的訂閱（bounded queue）"""
+
+    def __init__(self, room_id: str, maxsize: int = WS_QUEUE_SIZE):
+        self.room_id = room_id
+        # None 是結束訊號：連線處理端收到就關閉連線
+        self.queue: "asyncio.Queue[Optional[WSEvent]]" = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def close(self) -> None:
+        """丟掉尚未送出的事件並放入結束訊號（客戶端重連後會補發）"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class WebSocketHub:
+    """
+    房間層級的 WebSocket fan-out
+
+    注意：
+        - subscribe / unsubscribe / _fan_out 只在 event loop 上執行
+        - publish 可以從任何 thread 呼叫
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rooms: Dict[str, Set[Subscription]] = {}
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def stop(self) -> None:
+        self._loop = None
+        for subscriptions in self._rooms.values():
+            for subscription in subscriptions:
+                subscription.close()
+        self._rooms.clear()
+
+    def subscribe(self, room_id: str) -> Subscription:
+        subscription = Subscription(room_id)
+        self._rooms.setdefault(room_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._rooms.get(subscription.room_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._rooms[subscription.room_id]
+
+    def publish(self, room_id: str, events: List[WSEvent]) -> None:
+        """把事件交給 event loop 廣播（Hub 沒啟動時直接略過）"""
+        loop = self._loop
+        if loop is None or not events:
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, room_id, events)
+        except RuntimeError:
+            # Event loop 已關閉（shutdown 中）
+            pass
+
+    def _fan_out(self, room_id: str, events: List[WSEvent]) -> None:
+        for subscription in list(self._rooms.get(room_id, ())):
+            for ws_event in events:
+                try:
+                    subscription.queue.put_nowait(ws_event)
+                except asyncio.QueueFull:
+                    logger.warning(f"WebSocket subscriber in room {room_id} is too slow, disconnecting")
+                    subscription.close()
+                    self.unsubscribe(subscription)
+                    break
+
+
+ws_hub = WebSocketHub()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_events(session: Session, flush_context) -> None:
+    for obj in session.new:
+        if isinstance(obj, EventLog) and obj.event_type in EVENT_TYPE_MAP:
+            session.info.setdefault(_PENDING_EVENTS_KEY, []).append(
+                (obj.id, obj.room_id, obj.event_type, obj.data)
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session: Session) -> None:
+    pending = session.info.pop(_PENDING_EVENTS_KEY, None)
+    if not pending:
+        return
+
+    by_room: Dict[str, List[WSEvent]] = {}
+    for event_id, room_id, event_type, data in pending:
+        by_room.setdefault(room_id, []).extend(to_ws_events(event_id, room_id, event_type, data))
+
+    for room_id, events in by_room.items():
+        ws_hub.publish(room_id, events)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_events(session: Session, transaction) -> None:
+    # after_commit 已經取走；還留著代表外層 transaction 被 rollback 了
+    if transaction.parent is None:
+        session.info.pop(_PENDING_EVENTS_KEY, None)
@@ -1,15 +1,56 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic_settings import BaseSettings
 from functools import lru_cache, wraps
+from typing import Dict, Optional
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./chicken_game.db"
+    # 唯讀 replica（GET endpoint 使用）；留空表示讀寫都走 database_url
+    read_database_url: str = ""
+    # read-your-writes：玩家寫入後這麼多秒內，他的讀取仍走 primary（需大於 replica 延遲）
+    read_your_writes_seconds: float = 5.0
+    # /state 快照快取（services/snapshot_cache.py）
+    snapshot_cache_max_entries: int = 2048
+    snapshot_cache_ttl_seconds: float = 300.0
+    # /state 快速路徑：記憶體版本表的有效秒數（多 worker 時其他 process 的變更最慢這麼久才看到）
+    state_version_ttl_seconds: float = 1.0
+    # /state?delta=true：每個 (房間, 玩家) 保留最近幾個版本的快照當 diff 基準（services/state_history.py）
+    state_delta_history_depth: int = 8
+    state_delta_max_streams: int = 4096
+    # 背景結算回合的 worker thread 數（core/finalize_worker.py）；0 表示在 request 內同步結算
+    finalize_worker_threads: int = 2
+    # 每幾秒掃一次「全員已提交但未結算」的回合重新入列（重試用完或重啟後遺失的工作）；0 表示只在啟動時掃
+    finalize_sweep_seconds: float = 30.0
+    # 非即時 EventLog（audit 用）的批次寫入：每幾秒或累積幾筆寫一次（core/event_sink.py）
+    event_sink_flush_seconds: float = 1.0
+    event_sink_max_batch: int = 500
+    # async engine（讀取用的熱門 endpoint，例如 /state）；留空時由 database_url 推導
+    # （sqlite → sqlite+aiosqlite、postgresql → postgresql+asyncpg），driver 沒安裝則退回 threadpool
+    async_database_url: str = ""
+    use_async_engine: bool = True
+    # SQLite 模式（database_url 為 sqlite 時在每條連線套用）
+    sqlite_journal_mode: str = "WAL"      # WAL：讀取不會被寫入擋住
+    sqlite_busy_timeout_ms: int = 5000    # 等待其他連線寫入完成的時間，而不是立刻 "database is locked"
+    sqlite_synchronous: str = "NORMAL"    # WAL 下 NORMAL 已足夠安全，fsync 次數少很多
+    # core/locks.py 的鎖後端：auto / row（SELECT ... FOR UPDATE）/ process（每個房間一把 process 內的鎖）
+    lock_backend: str = "auto"
+    lock_timeout_seconds: float = 30.0
+    # 每個 request 的 SQL 查詢預算（core/query_stats.py）；0 表示不限制
+    query_budget: int = 0
+    # 個別 route 的預算，key 為 "METHOD path"，例如 {"GET /api/rooms/{room_id}/summary": 20}（環境變數用 JSON）
+    query_budget_routes: Dict[str, int] = {}
+    # 超過預算時：log（記錄 warning）或 raise（拋出 QueryBudgetExceeded，CI 用）
+    query_budget_action: str = "log"
 
     class Config:
         env_file = ".env"
@@ -22,16 +63,110 @@ def get_settings():
 
 settings = get_settings()
 
-# SQLite 需要特殊設定：connect_args={"check_same_thread": False}
-# 這允許多執行緒存取同一個 SQLite 連線（FastAPI 的多執行緒環境需要）
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
-    pool_pre_ping=True
-)
+
+def _create_engine(database_url: str):
+    # SQLite 需要特殊設定：connect_args={"check_same_thread": False}
+    # 這允許多執行緒存取同一個 SQLite 連線（FastAPI 的多執行緒環境需要）
+    return create_engine(
+        database_url,
+        connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {},
+        pool_pre_ping=True
+    )
+
+
+engine = _create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 讀取用 engine：設定 read_database_url 時連到 replica，否則就是 primary 本身
+read_engine = _create_engine(settings.read_database_url) if settings.read_database_url else engine
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    if read_engine is not engine else SessionLocal
+)
+
+
+def configure_sqlite(sync_engine) -> None:
+    """
+    SQLite 模式：每條新連線套用 journal_mode / busy_timeout / synchronous
+
+    注意：
+        - :memory: 資料庫不支援 WAL，只套用其他設定
+        - SQLite 會忽略 FOR UPDATE，互斥由 core/locks.py 的 process 鎖後端負責
+    """
+    in_memory = sync_engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not in_memory:
+                cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        finally:
+            cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    configure_sqlite(engine)
+if read_engine is not engine and read_engine.dialect.name == "sqlite":
+    configure_sqlite(read_engine)
+
+# 同步 driver -> 對應的 async driver
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_url_for(database_url: str) -> str:
+    """
+    由同步的 database_url 推導 async engine 的 URL
+
+    範例：
+        sqlite:///./chicken_game.db          -> sqlite+aiosqlite:///./chicken_game.db
+        postgresql+psycopg2://u:p@host/db    -> postgresql+asyncpg://u:p@host/db
+    """
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _create_async_engine():
+    """
+    建立 async engine；未啟用或 driver 沒安裝時返回 None
+
+    注意：
+        - 只用於讀取（/state），URL 預設由 read_database_url（沒有則 database_url）推導
+        - async engine 有自己的連線池，與同步 engine 分開
+        - Session 的 event listener（state_version、WebSocket 推送等）掛在 Session class 上，
+          AsyncSession 底下的 sync session 一樣會觸發
+    """
+    if not settings.use_async_engine:
+        return None
+    try:
+        url = settings.async_database_url or async_url_for(settings.read_database_url or settings.database_url)
+        return create_async_engine(
+            url,
+            connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+            pool_pre_ping=True
+        )
+    except (ImportError, ValueError) as e:
+        logger.info(f"Async engine disabled, hot read endpoints use the threadpool: {e}")
+        return None
+
+
+async_engine = _create_async_engine()
+if async_engine is not None and async_engine.dialect.name == "sqlite":
+    configure_sqlite(async_engine.sync_engine)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if async_engine is not None else None
+)
+
 
 def get_db():
     """
@@ -46,6 +181,59 @@ def get_db():
         db.close()
 
 
+class PrimaryPins:
+    """
+    read-your-writes：剛寫入過的 key（player_id）在 ttl 秒內讀 primary，不讀可能落後的 replica
+
+    注意：
+        - 只在同一個 process 內有效；多 worker 時需要 sticky session（同一玩家固定到同一個 worker）
+        - 沒有設定 replica 時 pin() 不做任何事
+    """
+
+    # 超過這個數量時順便清掉過期的 key
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._pinned_until: Dict[str, float] = {}
+
+    def pin(self, key: Optional[str]) -> None:
+        if not key or read_engine is engine:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pinned_until[key] = now + self.ttl_seconds
+            if len(self._pinned_until) > self.PRUNE_THRESHOLD:
+                self._pinned_until = {k: t for k, t in self._pinned_until.items() if t > now}
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        until = self._pinned_until.get(key)
+        return until is not None and until > time.monotonic()
+
+
+primary_pins = PrimaryPins(settings.read_your_writes_seconds)
+
+
+def get_read_db(player_id: Optional[str] = None):
+    """
+    FastAPI dependency：GET endpoint 的 Session（session 層級的讀寫分離）
+
+    - 預設讀 replica（沒有設定 read_database_url 時就是 primary）
+    - player_id（query string）在 read_your_writes_seconds 內寫入過 → 讀 primary
+
+    注意：
+        - 只能讀取；寫入一律用 get_db
+    """
+    db = SessionLocal() if primary_pins.is_pinned(player_id) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def transactional(func):
     """
     Transaction decorator：確保資料庫操作的原子性
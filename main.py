@@ -4,7 +4,11 @@ from contextlib import asynccontextmanager
 import logging
 
 from database import Base, engine, get_db
-from api import rooms, players, rounds
+from api import rooms, players, rounds, ws
+from core.ws_hub import ws_hub
+from core.finalize_worker import finalize_worker
+from core.event_sink import event_sink
+from core.query_stats import QueryStatsMiddleware, query_stats
 from utils.cleanup import cleanup_old_rooms, cleanup_inactive_rooms
 
 logger = logging.getLogger(__name__)
@@ -20,6 +24,15 @@ async def lifespan(app: FastAPI):
     import asyncio
     from functools import partial
 
+    # WebSocket Hub 需要 event loop 才能從 request thread 廣播
+    ws_hub.start(asyncio.get_running_loop())
+
+    # 回合結算改由背景 worker 處理，最後一位提交者不用等 Payoff 計算
+    finalize_worker.start()
+
+    # audit 用的 EventLog（STATE_VERSION_BUMPED 等）改為背景批次寫入
+    event_sink.start()
+
     async def run_cleanup_task():
         """定期清理任務"""
         while True:
@@ -51,7 +64,10 @@ async def lifespan(app: FastAPI):
 
     yield
 
-    # Shutdown: 取消背景任務
+    # Shutdown: 關閉 WebSocket 訂閱、取消背景任務
+    ws_hub.stop()
+    finalize_worker.stop()
+    event_sink.stop()
     cleanup_task.cancel()
     try:
         await cleanup_task
@@ -74,12 +90,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Query-Count"],
 )
 
+# 每個 request 的 SQL 查詢數 / DB 時間（Server-Timing header、查詢預算）
+app.add_middleware(QueryStatsMiddleware)
+
 # Include routers
 app.include_router(rooms.router)
 app.include_router(players.router)
 app.include_router(rounds.router)
+app.include_router(ws.router)
 
 
 @app.get("/")
@@ -92,6 +113,12 @@ def health():
     return {"status": "healthy"}
 
 
+@app.get("/stats/queries")
+def get_query_stats():
+    """各 route 累計的 SQL 查詢數與 DB 時間（core/query_stats.py）"""
+    return query_stats.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
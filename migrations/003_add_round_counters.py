@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Migration: 新增 Round 完成度計數器
+
+背景：
+- all_actions_submitted 原本每次提交都要查 Round + 兩次 COUNT(*)
+- 改為在 rounds 上維護 expected_actions / submitted_actions，完成判斷變成 O(1)
+
+步驟：
+1. 新增 expected_actions、submitted_actions 欄位（預設 0）
+2. 由 pairs / actions 回填既有回合的計數器（utils/round_counters.py）
+
+執行：
+    python migrations/003_add_round_counters.py
+
+回滾：
+    python migrations/003_add_round_counters.py --rollback
+"""
+import sys
+import os
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from database import engine, SessionLocal
+from utils.round_counters import check_round_counters
+
+COLUMNS = ("expected_actions", "submitted_actions")
+
+
+def upgrade():
+    """新增計數器欄位並回填"""
+    print("Running migration: Add expected_actions / submitted_actions to rounds table")
+
+    existing = {c["name"] for c in inspect(engine).get_columns("rounds")}
+
+    with engine.connect() as conn:
+        for column in COLUMNS:
+            if column in existing:
+                print(f"⚠ '{column}' already exists, skipping...")
+                continue
+            conn.execute(text(
+                f"ALTER TABLE rounds ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+            ))
+            print(f"✓ Added '{column}' column")
+        conn.commit()
+
+    # 回填：由 pairs / actions 重建所有回合的計數器
+    db = SessionLocal()
+    try:
+        fixed = check_round_counters(db, fix=True)
+        print(f"✓ Backfilled counters for {len(fixed)} rounds")
+    finally:
+        db.close()
+
+    print("✓ Migration completed successfully")
+
+
+def downgrade():
+    """移除計數器欄位（SQLite 需要 3.35+ 才支援 DROP COLUMN）"""
+    print("Rolling back migration: Remove round counters")
+
+    existing = {c["name"] for c in inspect(engine).get_columns("rounds")}
+
+    with engine.connect() as conn:
+        for column in COLUMNS:
+            if column not in existing:
+                print(f"⚠ '{column}' does not exist, skipping...")
+                continue
+            conn.execute(text(f"ALTER TABLE rounds DROP COLUMN {column}"))
+            print(f"✓ Dropped '{column}' column")
+        conn.commit()
+
+    print("✓ Rollback completed successfully")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Migration: 配對改為房間層級
+
+背景：
+- 原本每建立一個回合就把 Round 1 的配對逐筆複製一份（pairs 表是實際配對數的 10 倍）
+- 現在整場遊戲只在 Round 1 配對一次，之後的回合直接以 room_id 查詢同一組配對
+
+步驟：
+1. 刪除 Round 2 之後複製出來的配對（與 Round 1 完全相同的才刪）
+2. 配對與 Round 1 不同的房間（舊版本每回合重新洗牌的資料）正規化成一組配對：
+   只保留最後一個有配對的回合那一組（目前進行中回合實際使用的配對），其餘刪除
+   （否則以 room_id 查詢會同時讀到好幾組配對：對手錯誤、expected_actions 與 Payoff 重複計算）
+3. 重建回合計數器（utils/round_counters.py）：003 以房間的配對總數回填 expected_actions，
+   刪掉複製的配對之後，這些房間每個回合的 expected_actions 都偏大（進行中的回合永遠無法結算）
+
+注意：
+- 正規化房間已計算的 Payoff 不變；但較早回合的歷史紀錄會以保留的那組配對顯示對手
+
+執行：
+    python migrations/004_room_level_pairs.py
+
+回滾：
+    python migrations/004_room_level_pairs.py --rollback
+    （依 Round 1 的配對，為之後的每個回合重新複製一份；被正規化房間刪掉的配對無法還原）
+"""
+import sys
+import os
+
+# Add parent directory to path so we can import from backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from database import SessionLocal
+from models import Pair, Round
+from utils.round_counters import check_round_counters
+
+
+def _pairs_by_round(db):
+    """round_id -> {(player1_id, player2_id)}，以及 room_id -> Round 1 的 round_id"""
+    by_round = {}
+    for round_id, player1_id, player2_id in db.query(Pair.round_id, Pair.player1_id, Pair.player2_id):
+        by_round.setdefault(round_id, set()).add((player1_id, player2_id))
+
+    first_rounds = {
+        room_id: round_id
+        for room_id, round_id in db.query(Round.room_id, Round.id).filter(Round.round_number == 1)
+    }
+    return by_round, first_rounds
+
+
+def upgrade():
+    """刪除後續回合複製出來的配對"""
+    print("Running migration: Make pairs room-level (drop per-round copies)")
+
+    db = SessionLocal()
+    try:
+        by_round, first_rounds = _pairs_by_round(db)
+
+        copied_round_ids = []
+        mismatched_rooms = set()
+        # room_id -> 依回合數排序的 [(round_number, round_id)]（只含有配對的回合）
+        paired_rounds = {}
+        for room_id, round_id, round_number in (
+            db.query(Round.room_id, Round.id, Round.round_number).order_by(Round.round_number)
+        ):
+            if round_id not in by_round:
+                continue
+            paired_rounds.setdefault(room_id, []).append((round_number, round_id))
+            if round_number == 1:
+                continue
+            if by_round[round_id] == by_round.get(first_rounds.get(room_id)):
+                copied_round_ids.append(round_id)
+            else:
+                mismatched_rooms.add(room_id)
+
+        # 正規化：配對不一致的房間只保留最後一個有配對的回合那一組
+        for room_id in mismatched_rooms:
+            kept_round_id = paired_rounds[room_id][-1][1]
+            copied_round_ids.extend(
+                round_id for _, round_id in paired_rounds[room_id] if round_id != kept_round_id
+            )
+
+        deleted = 0
+        for start in range(0, len(copied_round_ids), 500):
+            deleted += db.query(Pair).filter(
+                Pair.round_id.in_(copied_round_ids[start:start + 500])
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        print(f"✓ Deleted {deleted} copied pairs from {len(copied_round_ids)} rounds")
+        for room_id in sorted(mismatched_rooms):
+            print(f"⚠ Room {room_id} was paired differently across rounds, kept its latest pairing")
+
+        # 配對數變了的房間（有複製被刪除或被正規化）一律重建計數器；只會寫入不一致的回合
+        fixed = check_round_counters(db, fix=True)
+        print(f"✓ Rebuilt counters for {len(fixed)} rounds")
+    finally:
+        db.close()
+
+    print("✓ Migration completed successfully")
+
+
+def downgrade():
+    """為 Round 2 之後的回合重新複製 Round 1 的配對"""
+    print("Rolling back migration: Copy Round 1 pairs to every later round")
+
+    db = SessionLocal()
+    try:
+        by_round, first_rounds = _pairs_by_round(db)
+
+        rows = []
+        for room_id, round_id in db.query(Round.room_id, Round.id).filter(Round.round_number > 1):
+            if round_id in by_round:
+                continue
+            for player1_id, player2_id in by_round.get(first_rounds.get(room_id), ()):
+                rows.append({
+                    "room_id": room_id,
+                    "round_id": round_id,
+                    "player1_id": player1_id,
+                    "player2_id": player2_id
+                })
+
+        if rows:
+            db.execute(insert(Pair), rows)
+        db.commit()
+        print(f"✓ Recreated {len(rows)} pairs")
+    finally:
+        db.close()
+
+    print("✓ Rollback completed successfully")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
+        downgrade()
+    else:
+        upgrade()
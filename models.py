@@ -67,6 +67,11 @@ class Player(Base):
     received_messages = relationship("Message", foreign_keys="Message.receiver_id", back_populates="receiver", cascade="all, delete-orphan")
     indicator = relationship("Indicator", back_populates="player", uselist=False, cascade="all, delete-orphan")
 
+    # 房間玩家列表 / 非 Host 玩家數
+    __table_args__ = (
+        Index('idx_player_room_host', 'room_id', 'is_host'),
+    )
+
 
 class Round(Base):
     __tablename__ = "rounds"
@@ -83,12 +88,21 @@ class Round(Base):
     result_calculated = Column(Boolean, default=False, nullable=False, index=True)
     # 樂觀鎖版本號：用於檢測並發衝突
     version = Column(Integer, default=1, nullable=False)
+    # 完成度計數器：建立配對時寫入 expected_actions，每新增一筆 Action 原子地 +1
+    # 讓「是否所有人都提交了」變成 O(1) 判斷（utils/round_counters.py 可由 actions 重建）
+    expected_actions = Column(Integer, default=0, nullable=False)
+    submitted_actions = Column(Integer, default=0, nullable=False)
 
     room = relationship("Room", back_populates="rounds")
     pairs = relationship("Pair", back_populates="round", cascade="all, delete-orphan")
     actions = relationship("Action", back_populates="round", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="round", cascade="all, delete-orphan")
 
+    # 以 (room_id, round_number) 找回合（目前回合、回合結果）
+    __table_args__ = (
+        Index('idx_round_room_number', 'room_id', 'round_number'),
+    )
+
 
 class Pair(Base):
     __tablename__ = "pairs"
@@ -104,6 +118,13 @@ class Pair(Base):
     player1 = relationship("Player", foreign_keys=[player1_id])
     player2 = relationship("Player", foreign_keys=[player2_id])
 
+    # 配對是房間層級的：以 room_id + 任一方玩家找對手；round_id 供建立配對的回合查詢與刪除回合時的 cascade
+    __table_args__ = (
+        Index('idx_pair_room_player1', 'room_id', 'player1_id'),
+        Index('idx_pair_room_player2', 'room_id', 'player2_id'),
+        Index('idx_pair_round', 'round_id'),
+    )
+
 
 class Action(Base):
     __tablename__ = "actions"
@@ -123,6 +144,10 @@ class Action(Base):
     # 加入唯一性約束：每個玩家在每個回合只能提交一次動作
     __table_args__ = (
         Index('idx_round_player', 'round_id', 'player_id', unique=True),
+        # 玩家總分 / 歷史
+        Index('idx_action_player', 'player_id'),
+        # 房間快照與策略統計
+        Index('idx_action_room_choice', 'room_id', 'choice'),
     )
 
 
@@ -142,6 +167,12 @@ class Message(Base):
     sender = relationship("Player", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("Player", foreign_keys=[receiver_id], back_populates="received_messages")
 
+    # 收到的訊息 / 是否已發送過
+    __table_args__ = (
+        Index('idx_message_round_receiver', 'round_id', 'receiver_id'),
+        Index('idx_message_round_sender', 'round_id', 'sender_id'),
+    )
+
 
 class Indicator(Base):
     __tablename__ = "indicators"
@@ -154,6 +185,10 @@ class Indicator(Base):
     room = relationship("Room", back_populates="indicators")
     player = relationship("Player", back_populates="indicator")
 
+    __table_args__ = (
+        Index('idx_indicator_room', 'room_id'),
+    )
+
 
 class EventLog(Base):
     """
@@ -169,9 +204,14 @@ class EventLog(Base):
 
     # 使用自增整數 ID，方便客戶端查詢 "給我 event_id > X 的所有事件"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    room_id = Column(String(36), ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False, index=True)
+    room_id = Column(String(36), ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     event_type = Column(String(50), nullable=False, index=True)
     data = Column(JSON, nullable=False, default={})
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     room = relationship("Room")
+
+    # 補發事件：WHERE room_id = ? AND id > ? ORDER BY id（取代原本單欄的 room_id 索引）
+    __table_args__ = (
+        Index('idx_event_room_id', 'room_id', 'id'),
+    )
@@ -186,6 +186,42 @@ class RoomStateResponse(BaseModel):
     version: int
     has_update: bool
     data: Optional[RoomStatePayload] = None
+    # delta=true 時：data 為 null，改回傳從 base_version 到 version 的 JSON Patch（套用在 data 上）
+    base_version: Optional[int] = None
+    patch: Optional[list[dict]] = None
+
+
+# Batch poll schemas（Host 儀表板一次輪詢多個房間）
+MAX_BATCH_POLL_ROOMS = 100
+
+
+class RoomVersion(BaseModel):
+    room_id: str
+    version: int = 0
+
+
+class RoomBatchPollRequest(BaseModel):
+    rooms: list[RoomVersion] = Field(..., max_length=MAX_BATCH_POLL_ROOMS)
+
+
+class RoomBatchSummary(BaseModel):
+    room_id: str
+    code: str
+    version: int
+    status: RoomStatus
+    current_round: int
+    round_status: Optional[RoundStatus] = None
+    submitted_actions: int = 0
+    total_players: int = 0
+    ready_to_publish: bool = False
+    player_count: int
+
+
+class RoomBatchPollResponse(BaseModel):
+    # 只包含 version 比 client 新的房間
+    rooms: list[RoomBatchSummary]
+    # 不存在（或已刪除）的 room_id
+    missing: list[str] = []
 
 
 # Summary schemas
@@ -217,6 +253,7 @@ class WSEventType:
 
 
 class WSEvent(BaseModel):
+    event_id: Optional[int] = None  # EventLog.id，重連時用來補發
     event_type: str
     room_id: str
     data: Optional[dict] = None
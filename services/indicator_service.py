@@ -13,10 +13,10 @@ from models import Player, Indicator, Round, Pair
 
 def assign_indicators(room_id: str, db: Session) -> None:
     """
-    為房間內所有玩家分配指標符號（依 Round1 配對，一組一符號）
+    為房間內所有玩家分配指標符號（依房間的配對，一組一符號）
 
     邏輯：
-    - 先找到 Round 1 的配對列表
+    - 先找到房間的配對列表（配對是房間層級的，只在 Round 1 建立一次）
     - 依序為每個配對指定同一個符號
     - 符號集輪替使用（🍋 🍎 🍇 🍊），配對數大於符號數則重複循環
 
@@ -42,8 +42,8 @@ def assign_indicators(room_id: str, db: Session) -> None:
     if not round1:
         raise ValueError("Round 1 not found for indicator assignment")
 
-    # 2) 取配對
-    pairs = db.query(Pair).filter(Pair.round_id == round1.id).all()
+    # 2) 取配對（房間層級）
+    pairs = db.query(Pair).filter(Pair.room_id == room_id).all()
     if not pairs:
         raise ValueError("No pairs found in Round 1 for indicator assignment")
 
@@ -5,18 +5,24 @@
 1. 隨機配對玩家
 2. 確保配對數量正確
 3. 不負責驗證（由 Manager 負責）
+
+配對是房間層級的：
+- 整場遊戲只在建立 Round 1 時配對一次（固定對手）
+- Pair.round_id 記錄配對建立的回合（Round 1），之後的回合不再複製配對
+- 查詢某回合的配對 = 查詢該回合所屬房間的配對
 """
 import random
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 
-from models import Player, Pair
+from models import Player, Pair, Round
 
 
 def create_pairs_for_round(room_id: str, round_id: str, db: Session) -> List[Pair]:
     """
-    為一個回合建立隨機配對
+    為房間建立整場遊戲的隨機配對（只在建立 Round 1 時呼叫）
 
     演算法：
     1. 取得房間內所有非 Host 玩家
@@ -25,7 +31,7 @@ def create_pairs_for_round(room_id: str, round_id: str, db: Session) -> List[Pai
 
     參數：
         room_id: 房間 ID
-        round_id: 回合 ID
+        round_id: 建立配對的回合 ID（Round 1）
         db: SQLAlchemy Session
 
     返回：
@@ -51,7 +57,7 @@ def create_pairs_for_round(room_id: str, round_id: str, db: Session) -> List[Pai
             f"Player count must be even for pairing, got {len(players)} players"
         )
 
-    # 3. 隨機洗牌（確保每回合配對都不同）
+    # 3. 隨機洗牌
     random.shuffle(players)
 
     # 4. 兩兩配對
@@ -72,50 +78,23 @@ def create_pairs_for_round(room_id: str, round_id: str, db: Session) -> List[Pai
     return pairs
 
 
-def copy_pairs_from_round(
-    room_id: str,
-    source_round_id: str,
-    target_round_id: str,
-    db: Session
-) -> List[Pair]:
+def count_room_pairs(room_id: str, db: Session) -> int:
     """
-    將既有回合的配對複製到新回合（維持固定對手）
+    房間的配對數量（每個回合都沿用同一組配對）
 
     參數：
         room_id: 房間 ID
-        source_round_id: 來源回合 ID（通常是 Round 1）
-        target_round_id: 目標回合 ID
         db: SQLAlchemy Session
 
     返回：
-        新建立的 Pair 物件列表
-
-    異常：
-        ValueError: 如果來源回合沒有任何配對
+        配對數量（尚未配對時為 0）
     """
-    source_pairs = db.query(Pair).filter(Pair.round_id == source_round_id).all()
-
-    if not source_pairs:
-        raise ValueError(f"No pairs found in source round {source_round_id}")
-
-    new_pairs: List[Pair] = []
-    for pair in source_pairs:
-        cloned = Pair(
-            room_id=room_id,
-            round_id=target_round_id,
-            player1_id=pair.player1_id,
-            player2_id=pair.player2_id
-        )
-        db.add(cloned)
-        new_pairs.append(cloned)
-
-    db.flush()
-    return new_pairs
+    return db.query(func.count(Pair.id)).filter(Pair.room_id == room_id).scalar()
 
 
 def get_pairs_in_round(round_id: str, db: Session) -> List[Pair]:
     """
-    取得某回合的所有配對
+    取得某回合的所有配對（即該回合所屬房間的配對）
 
     參數：
         round_id: 回合 ID
@@ -124,7 +103,7 @@ def get_pairs_in_round(round_id: str, db: Session) -> List[Pair]:
     返回：
         Pair 物件列表
     """
-    return db.query(Pair).filter(Pair.round_id == round_id).all()
+    return db.query(Pair).join(Round, Round.room_id == Pair.room_id).filter(Round.id == round_id).all()
 
 
 def get_opponent_id(round_id: str, player_id: str, db: Session) -> str:
@@ -147,8 +126,8 @@ def get_opponent_id(round_id: str, player_id: str, db: Session) -> str:
         get_opponent_id(round_id, A, db) -> B
         get_opponent_id(round_id, B, db) -> A
     """
-    pair = db.query(Pair).filter(
-        Pair.round_id == round_id,
+    pair = db.query(Pair).join(Round, Round.room_id == Pair.room_id).filter(
+        Round.id == round_id,
         ((Pair.player1_id == player_id) | (Pair.player2_id == player_id))
     ).first()
 
@@ -4,10 +4,11 @@
 純計算邏輯，實現 Game Theory 的 Payoff Matrix
 """
 
-from sqlalchemy.orm import Session
-from typing import Tuple
+from sqlalchemy import and_, select, union_all, update
+from sqlalchemy.orm import Session, aliased
+from typing import List, Tuple
 
-from models import Action, Choice, Pair
+from models import Action, Choice, Pair, Round
 
 
 def calculate_payoff(choice1: Choice, choice2: Choice) -> Tuple[int, int]:
@@ -50,19 +51,31 @@ def calculate_payoff(choice1: Choice, choice2: Choice) -> Tuple[int, int]:
         return (-10, -10)
 
 
+# (choice1, choice2) -> (payoff1, payoff2)，模組載入時由 calculate_payoff 預先算好
+PAYOFF_TABLE = {
+    (choice1, choice2): calculate_payoff(choice1, choice2)
+    for choice1 in Choice
+    for choice2 in Choice
+}
+
+
 def calculate_round_payoffs(round_id: str, db: Session) -> None:
     """
     計算一個回合內所有配對的 Payoff
 
     流程：
-    1. 找出回合內所有配對（Pairs）
-    2. 對於每個配對，找出兩個玩家的 Action
-    3. 計算 Payoff
-    4. 更新 Action 的 payoff 欄位
+    1. 一次 join 查詢取得所有 (配對, 玩家 1 Action, 玩家 2 Action)
+       （配對是房間層級的，以 Round 的 room_id 找配對）
+    2. 查 PAYOFF_TABLE 得到 Payoff
+    3. 一次 executemany UPDATE 寫回 Action.payoff
+
+    不論配對數多少都是固定兩個 statement（原本是每個配對兩次查詢）。
 
     注意：
-    - 如果有玩家沒提交 Action，該配對會被跳過（不計算）
+    - 如果有玩家沒提交 Action，該配對會被跳過（inner join 不會出現）
     - 不改變 Round 的狀態（由 RoundManager 負責）
+    - 以 primary key 批次更新，不會同步 session 裡已載入的 Action 物件
+      （外層 transaction commit 後會過期重新載入）
 
     參數：
         round_id: 回合 ID
@@ -71,36 +84,35 @@ def calculate_round_payoffs(round_id: str, db: Session) -> None:
     副作用：
         更新 Action.payoff 欄位
     """
-    # 1. 找出回合內所有配對
-    pairs = db.query(Pair).filter(Pair.round_id == round_id).all()
-
-    # 2. 對於每個配對，計算 Payoff
-    for pair in pairs:
-        # 2.1 找出玩家 1 的 Action
-        action1 = db.query(Action).filter(
-            Action.round_id == round_id,
-            Action.player_id == pair.player1_id
-        ).first()
-
-        # 2.2 找出玩家 2 的 Action
-        action2 = db.query(Action).filter(
-            Action.round_id == round_id,
-            Action.player_id == pair.player2_id
-        ).first()
-
-        # 2.3 如果有任一玩家沒提交，跳過此配對
-        if not action1 or not action2:
-            continue
-
-        # 2.4 計算 Payoff
-        payoff1, payoff2 = calculate_payoff(action1.choice, action2.choice)
-
-        # 2.5 更新 Action
-        action1.payoff = payoff1
-        action2.payoff = payoff2
-
-    # 3. Flush 但不 commit（讓外層 transaction 處理）
-    db.flush()
+    action1 = aliased(Action)
+    action2 = aliased(Action)
+
+    # 1. 所有配對與雙方的 Action（一次查詢）
+    rows = db.execute(
+        select(action1.id, action1.choice, action2.id, action2.choice)
+        .select_from(Round)
+        .join(Pair, Pair.room_id == Round.room_id)
+        .join(action1, and_(
+            action1.round_id == Round.id,
+            action1.player_id == Pair.player1_id
+        ))
+        .join(action2, and_(
+            action2.round_id == Round.id,
+            action2.player_id == Pair.player2_id
+        ))
+        .where(Round.id == round_id)
+    ).all()
+
+    # 2. 查表計算 Payoff
+    payoffs = []
+    for action1_id, choice1, action2_id, choice2 in rows:
+        payoff1, payoff2 = PAYOFF_TABLE[(choice1, choice2)]
+        payoffs.append({"id": action1_id, "payoff": payoff1})
+        payoffs.append({"id": action2_id, "payoff": payoff2})
+
+    # 3. 批次寫回（不 commit，讓外層 transaction 處理）
+    if payoffs:
+        db.execute(update(Action), payoffs)
 
 
 def calculate_total_payoff(player_id: str, db: Session) -> int:
@@ -128,7 +140,7 @@ def calculate_total_payoff(player_id: str, db: Session) -> int:
     return sum(action.payoff for action in actions if action.payoff is not None)
 
 
-def all_actions_submitted(round_id: str, db: Session) -> bool:
+def all_actions_submitted(round_id: str, db: Session, round_obj=None) -> bool:
     """
     檢查一個回合是否所有玩家都已提交 Action
 
@@ -136,32 +148,53 @@ def all_actions_submitted(round_id: str, db: Session) -> bool:
     - RoundManager 用來判斷是否可以開始計算結果
 
     邏輯：
-    - 計算房間內非 Host 玩家數量
-    - 計算此回合的 Action 數量
-    - 如果相等，表示所有人都提交了
+    - Round.expected_actions：建立配對時寫入（配對數 × 2）
+    - Round.submitted_actions：每新增一筆 Action 原子地 +1
+    - submitted >= expected 表示所有人都提交了（O(1)，不掃 actions 表）
 
     參數：
         round_id: 回合 ID
         db: SQLAlchemy Session
+        round_obj: 已經載入（通常是已鎖定）的 Round，傳入時不再重新查詢
 
     返回：
         True 如果所有玩家都提交了，False 否則
-    """
-    from models import Round, Player  # 避免 circular import
 
-    # 1. 找出回合所屬的房間
-    round_obj = db.query(Round).filter(Round.id == round_id).first()
+    注意：
+        計數器若與 actions 不一致，可用 utils/round_counters.py 重建
+    """
+    if round_obj is None:
+        round_obj = db.query(Round).filter(Round.id == round_id).first()
     if not round_obj:
         return False
 
-    # 2. 計算房間內非 Host 玩家數量
-    player_count = db.query(Player).filter(
-        Player.room_id == round_obj.room_id,
-        Player.is_host == False
-    ).count()
+    return 0 < round_obj.expected_actions <= round_obj.submitted_actions
 
-    # 3. 計算此回合的 Action 數量
-    action_count = db.query(Action).filter(Action.round_id == round_id).count()
 
-    # 4. 比較
-    return action_count == player_count
+def get_unsubmitted_player_ids(round_id: str, db: Session) -> List[str]:
+    """
+    找出某回合有配對但尚未提交 Action 的玩家
+
+    用途：
+    - skip_round 為這些玩家補上預設選擇
+
+    實作：
+        一次查詢：配對中的玩家（player1 ∪ player2）排除已有 Action 的玩家
+
+    參數：
+        round_id: 回合 ID
+        db: SQLAlchemy Session
+
+    返回：
+        玩家 ID 列表
+    """
+    room_id = select(Round.room_id).where(Round.id == round_id).scalar_subquery()
+    paired = union_all(
+        select(Pair.player1_id.label("player_id")).where(Pair.room_id == room_id),
+        select(Pair.player2_id.label("player_id")).where(Pair.room_id == room_id)
+    ).subquery()
+    submitted = select(Action.player_id).where(Action.round_id == round_id)
+
+    return list(db.execute(
+        select(paired.c.player_id).where(paired.c.player_id.not_in(submitted))
+    ).scalars())
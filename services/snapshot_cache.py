@@ -0,0 +1,117 @@
+"""
+Snapshot cache: bounded in-process cache for /state snapshots.
+
+Keys are (room_id, state_version, player_id or "shared"), so a newer
+state_version simply misses. Once bump_state_version's transaction commits,
+state_service drops the room's older entries so memory is not held by
+snapshots nobody will ask for again.
+
+Eviction:
+- LRU when the cache holds more than max_entries
+- TTL so idle rooms do not pin memory forever
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+from database import settings
+
+SHARED_KEY = "shared"
+
+CacheKey = Tuple[str, int, Hashable]
+
+
+class SnapshotCache:
+    """Thread-safe LRU + TTL cache (sync endpoints run inside the threadpool)."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._room_keys: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(room_id: str, version: int, player_id: Optional[Hashable] = None) -> CacheKey:
+        return (room_id, version, player_id or SHARED_KEY)
+
+    def get(self, room_id: str, version: int, player_id: Optional[Hashable] = None) -> Optional[Any]:
+        key = self.make_key(room_id, version, player_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < now:
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, room_id: str, version: int, player_id: Optional[Hashable], value: Any) -> None:
+        key = self.make_key(room_id, version, player_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._room_keys.setdefault(room_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate_room(self, room_id: str, keep_version: Optional[int] = None) -> int:
+        """
+        Drop cached snapshots of a room.
+        With keep_version, only entries older than that version are removed.
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            keys = self._room_keys.get(room_id)
+            if not keys:
+                return 0
+
+            stale = [k for k in keys if keep_version is None or k[1] < keep_version]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._room_keys.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: CacheKey) -> None:
+        # Caller must hold self._lock
+        self._entries.pop(key, None)
+        room_keys = self._room_keys.get(key[0])
+        if room_keys is not None:
+            room_keys.discard(key)
+            if not room_keys:
+                del self._room_keys[key[0]]
+
+
+snapshot_cache = SnapshotCache(
+    max_entries=settings.snapshot_cache_max_entries,
+    ttl_seconds=settings.snapshot_cache_ttl_seconds,
+)
@@ -0,0 +1,102 @@
+"""
+State broker: wakes up async waiters when a room's state_version moves.
+
+state_service publishes every committed bump here (after_commit), and
+long-polling /state requests await the next version without holding a DB
+connection or a threadpool slot.
+
+The broker is process-local: with several worker processes a waiter only
+hears about bumps committed by its own process, so callers must always
+bound the wait with a timeout and re-check the database afterwards.
+"""
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "after_version")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future, after_version: int):
+        self.loop = loop
+        self.future = future
+        self.after_version = after_version
+
+
+def _resolve(future: asyncio.Future, version: int) -> None:
+    if not future.done():
+        future.set_result(version)
+
+
+class StateVersionBroker:
+    """Thread-safe fan-out of committed state_version numbers to asyncio waiters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: Dict[str, int] = {}
+        self._waiters: Dict[str, Set[_Waiter]] = {}
+
+    def latest(self, room_id: str) -> Optional[int]:
+        """Latest version this process has seen committed for the room, if any."""
+        with self._lock:
+            return self._latest.get(room_id)
+
+    def publish(self, room_id: str, version: int) -> None:
+        """
+        Record a committed version and wake waiters that are behind it.
+        Safe to call from any thread (usually a threadpool worker after commit).
+        """
+        with self._lock:
+            if version <= self._latest.get(room_id, 0):
+                return
+            self._latest[room_id] = version
+
+            waiters = self._waiters.get(room_id)
+            if not waiters:
+                return
+            ready = {w for w in waiters if w.after_version < version}
+            waiters -= ready
+            if not waiters:
+                del self._waiters[room_id]
+
+        for waiter in ready:
+            try:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future, version)
+            except RuntimeError:
+                # Event loop already closed (shutdown); nothing left to wake.
+                pass
+
+    async def wait_for_version(self, room_id: str, after_version: int, timeout: float) -> Optional[int]:
+        """
+        Wait until a version newer than after_version is committed.
+
+        Returns the new version, or None when the timeout expires first.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop, loop.create_future(), after_version)
+
+        with self._lock:
+            latest = self._latest.get(room_id)
+            if latest is not None and latest > after_version:
+                return latest
+            self._waiters.setdefault(room_id, set()).add(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(room_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[room_id]
+
+    def forget(self, room_id: str) -> None:
+        """Drop bookkeeping for a deleted room."""
+        with self._lock:
+            self._latest.pop(room_id, None)
+
+
+state_broker = StateVersionBroker()
@@ -0,0 +1,80 @@
+"""
+State history: short ring buffer of recently served /state snapshots.
+
+Delta responses need the snapshot the client already has. The snapshot
+cache cannot provide it because older versions are dropped as soon as a
+newer one commits, so every rendered snapshot is also kept here, per
+(room_id, player_id or "shared"), for the last `depth` versions.
+
+When the client's base version has been evicted (or was never served by
+this process), get() misses and the caller falls back to a full snapshot.
+"""
+from collections import OrderedDict, deque
+import threading
+from typing import Deque, Dict, Optional, Tuple
+
+from database import settings
+from services.snapshot_cache import SHARED_KEY
+
+StreamKey = Tuple[str, str]
+
+
+class StateHistory:
+    """Thread-safe; bounded both per stream (depth) and in number of streams."""
+
+    def __init__(self, depth: int = 8, max_streams: int = 4096):
+        self.depth = depth
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[StreamKey, Deque[Tuple[int, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(room_id: str, player_id: Optional[str]) -> StreamKey:
+        return (room_id, player_id or SHARED_KEY)
+
+    def record(self, room_id: str, player_id: Optional[str], version: int, body: bytes) -> None:
+        """Remember the snapshot served for `version` (no-op if already recorded)."""
+        if self.depth <= 0:
+            return
+        key = self._key(room_id, player_id)
+        with self._lock:
+            ring = self._streams.get(key)
+            if ring is None:
+                ring = self._streams[key] = deque(maxlen=self.depth)
+            self._streams.move_to_end(key)
+
+            if any(v == version for v, _ in ring):
+                return
+            ring.append((version, body))
+
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+
+    def get(self, room_id: str, player_id: Optional[str], version: int) -> Optional[bytes]:
+        key = self._key(room_id, player_id)
+        with self._lock:
+            ring = self._streams.get(key)
+            if ring is None:
+                return None
+            for v, body in ring:
+                if v == version:
+                    return body
+            return None
+
+    def forget_room(self, room_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._streams if k[0] == room_id]:
+                del self._streams[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "snapshots": sum(len(ring) for ring in self._streams.values()),
+            }
+
+
+state_history = StateHistory(
+    depth=settings.state_delta_history_depth,
+    max_streams=settings.state_delta_max_streams
+)
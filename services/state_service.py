@@ -1,110 +1,394 @@
 """
 State service: builds versioned room snapshots for short polling
 and bumps the state_version counter whenever important changes happen.
+
+Snapshots are composed from a shared, room-wide section (computed and
+serialized once per state_version) and a small per-player overlay, so a
+version costs O(players) work for the whole room instead of O(players²).
 """
 from datetime import datetime
+import json
 import logging
-from typing import Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
+from pydantic import TypeAdapter
+from sqlalchemy import and_, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from core.event_sink import record_event
 from core.exceptions import RoomNotFound
-from core.locks import with_room_lock
+from database import AsyncSessionLocal, ReadSessionLocal, SessionLocal, async_engine, engine, read_engine
 from models import (
     Room,
     Player,
     Round,
+    Pair,
     Action,
     Message,
-    EventLog
+    Indicator,
+    RoundStatus
 )
 from schemas import (
     RoomStateResponse,
-    RoomStatePayload,
     RoundStatePayload,
     PlayerStatePayload,
+    PlayerSubmissionStatus,
     MessageStatePayload,
     RoomStatusResponse,
-)
-from services.indicator_service import (
-    get_player_indicator,
-    indicators_already_assigned
-)
-from services.pairing_service import (
-    get_opponent_id,
-    get_pairs_in_round
+    RoundHistoryEntry,
+    RoomBatchSummary,
 )
 from services.round_phase_service import is_message_round
-from services.history_service import get_player_round_history
-from services.payoff_service import calculate_total_payoff
+from services.snapshot_cache import snapshot_cache
+from services.state_history import state_history
+from services.state_broker import state_broker
+from services.version_table import room_versions
+from utils.json_patch import make_patch
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Session.info key: {room_id: [reason, ...]} bumps requested inside the current transaction
+_REQUESTED_BUMPS_KEY = "requested_state_bumps"
+# Session.info key: {room_id: state_version} written by the commit in progress
+_PENDING_BUMPS_KEY = "pending_state_bumps"
 
-def bump_state_version(db: Session, room_id: str, reason: Optional[str] = None) -> int:
+# Coalesces concurrent builds of the same (room_id, state_version) shared section
+snapshot_flights = SingleFlight()
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_requested_bumps(session: Session) -> None:
     """
-    Increment room.state_version to signal polling clients there is new data.
-    Keeps everything inside the existing transaction and optionally logs an event.
+    Turn the bumps requested during the transaction into one increment
+    per room, as the last writes before the commit.
     """
-    room = with_room_lock(room_id, db).first()
-    if not room:
+    requested = session.info.pop(_REQUESTED_BUMPS_KEY, None)
+    if not requested:
+        return
+    # Flush the transaction's other writes first so the room row is
+    # locked for as short a time as possible
+    session.flush()
+    for room_id, reasons in requested.items():
+        _increment_state_version(session, room_id, reasons)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_versions(session: Session) -> None:
+    """
+    Once a bump is durable, drop snapshots older than the new version
+    and wake long-polling clients waiting on the room.
+    """
+    bumped = session.info.pop(_PENDING_BUMPS_KEY, None)
+    if not bumped:
+        return
+    for room_id, version in bumped.items():
+        room_versions.observe(room_id, version)
+        snapshot_cache.invalidate_room(room_id, keep_version=version)
+        state_broker.publish(room_id, version)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_versions(session: Session, transaction) -> None:
+    # after_commit has already consumed them; leftovers mean a rollback
+    if transaction.parent is None:
+        session.info.pop(_REQUESTED_BUMPS_KEY, None)
+        session.info.pop(_PENDING_BUMPS_KEY, None)
+
+
+def bump_state_version(db: Session, room_id: str, reason: Optional[str] = None) -> None:
+    """
+    Signal polling clients there is new data: request a state_version
+    increment for the room when the current transaction commits.
+
+    Requests are coalesced to at most one increment per room per
+    transaction (with all reasons recorded in a single event), and are
+    dropped if the transaction rolls back. Only call this when something
+    clients can see has actually changed; every bump invalidates the
+    room's snapshots.
+    """
+    reasons = db.info.setdefault(_REQUESTED_BUMPS_KEY, {}).setdefault(room_id, [])
+    if reason and reason not in reasons:
+        reasons.append(reason)
+
+
+def _increment_state_version(db: Session, room_id: str, reasons: List[str]) -> int:
+    """
+    Apply one increment with a single atomic `UPDATE ... RETURNING`
+    rather than SELECT ... FOR UPDATE followed by an UPDATE, so the room
+    row is only locked by the write itself and there is no extra round
+    trip while holding it. Backends without UPDATE ... RETURNING fall
+    back to UPDATE then SELECT.
+    """
+    now = datetime.utcnow()
+    stmt = (
+        update(Room)
+        .where(Room.id == room_id)
+        .values(state_version=Room.state_version + 1, updated_at=now)
+        # Room objects already in the session pick up the new values from
+        # RETURNING instead of being reloaded
+        .execution_options(synchronize_session="fetch")
+    )
+
+    if db.get_bind().dialect.update_returning:
+        version = db.execute(stmt.returning(Room.state_version)).scalar()
+    else:
+        result = db.execute(stmt)
+        version = None
+        if result.rowcount:
+            version = db.execute(
+                select(Room.state_version).where(Room.id == room_id)
+            ).scalar()
+
+    if version is None:
         raise RoomNotFound(room_id)
 
-    room.state_version = (room.state_version or 0) + 1
-    room.updated_at = datetime.utcnow()
+    if reasons:
+        record_event(db, room_id, "STATE_VERSION_BUMPED", {
+            "reason": "+".join(reasons),
+            "version": version
+        })
+
+    session_bumps = db.info.setdefault(_PENDING_BUMPS_KEY, {})
+    session_bumps[room_id] = version
+
+    logger.debug("Room %s state_version bumped to %s (%s)", room_id, version, "+".join(reasons) or "no reason")
+    return version
+
+
+def peek_state_version(room_id: str, client_version: int = 0) -> Optional[int]:
+    """
+    Zero-I/O fast path: the room's state_version from the in-memory table.
+    Returns None on a miss, or when the client claims a newer version than
+    the table holds (the entry is stale and must be re-read).
+    """
+    version = room_versions.get(room_id)
+    if version is None or client_version > version:
+        return None
+    return version
+
+
+def fetch_state_version(room_id: str, client_version: int = 0, primary: bool = False) -> Optional[int]:
+    """
+    Current state_version of a room, or None if the room does not exist.
+    Tries the in-memory table first and falls back to a single-column
+    SELECT on a plain connection (no ORM Session, no Room entity), on the
+    read replica unless primary=True.
+    """
+    version = peek_state_version(room_id, client_version)
+    if version is not None:
+        return version
+
+    with (engine if primary else read_engine).connect() as conn:
+        version = conn.execute(_state_version_query(room_id)).scalar()
+
+    return _observe_fetched(room_id, version)
+
+
+def _state_version_query(room_id: str):
+    """The single-column SELECT shared by the sync and async fetch paths."""
+    return select(Room.state_version).where(Room.id == room_id)
+
+
+def _observe_fetched(room_id: str, version: Optional[int]) -> Optional[int]:
+    if version is None:
+        return None
+    return room_versions.observe(room_id, version)
+
+
+def summarize_changed_rooms(
+    db: Session,
+    client_versions: Dict[str, int]
+) -> Tuple[List[RoomBatchSummary], List[str]]:
+    """
+    Compact summaries of the rooms whose state_version is newer than the
+    client's, for dashboards watching many rooms at once.
 
-    if reason:
-        db.add(EventLog(
+    Rooms the in-memory version table already knows to be unchanged are
+    skipped without I/O; the rest are loaded with a single statement that
+    joins each room's current round (whose completion counters give the
+    progress) with grouped player counts. Returns (changed summaries,
+    room_ids that do not exist).
+    """
+    candidates = []
+    for room_id, client_version in client_versions.items():
+        known = peek_state_version(room_id, client_version)
+        if known is not None and known <= client_version:
+            continue  # unchanged, and we know it without touching the database
+        candidates.append(room_id)
+    if not candidates:
+        return [], []
+
+    player_counts = (
+        select(Player.room_id, func.count(Player.id).label("player_count"))
+        .where(Player.room_id.in_(candidates), Player.is_host.is_(False))
+        .group_by(Player.room_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Room.id,
+            Room.code,
+            Room.status,
+            Room.current_round,
+            Room.state_version,
+            Round.status,
+            func.coalesce(Round.submitted_actions, 0),
+            func.coalesce(Round.expected_actions, 0),
+            func.coalesce(player_counts.c.player_count, 0),
+        )
+        .outerjoin(Round, and_(Round.room_id == Room.id, Round.round_number == Room.current_round))
+        .outerjoin(player_counts, player_counts.c.room_id == Room.id)
+        .where(Room.id.in_(candidates))
+    ).all()
+
+    summaries = []
+    found = set()
+    for (room_id, code, status, current_round, version, round_status,
+         submitted_actions, expected_actions, player_count) in rows:
+        found.add(room_id)
+        # Report the version read with this row so it matches the
+        # progress fields; the table may already hold a newer one
+        version = version or 0
+        room_versions.observe(room_id, version)
+        if version <= client_versions[room_id]:
+            continue
+        summaries.append(RoomBatchSummary(
             room_id=room_id,
-            event_type="STATE_VERSION_BUMPED",
-            data={
-                "reason": reason,
-                "version": room.state_version
-            },
-            created_at=datetime.utcnow()
+            code=code,
+            version=version,
+            status=status,
+            current_round=current_round,
+            round_status=round_status,
+            submitted_actions=submitted_actions,
+            total_players=expected_actions,
+            ready_to_publish=(round_status == RoundStatus.READY_TO_PUBLISH),
+            player_count=player_count
         ))
 
-    logger.debug("Room %s state_version bumped to %s (%s)", room_id, room.state_version, reason or "no reason")
-    return room.state_version
+    missing = [room_id for room_id in candidates if room_id not in found]
+    return summaries, missing
 
 
-def build_room_state(
-    db: Session,
-    room_id: str,
-    client_version: Optional[int] = None,
-    player_id: Optional[str] = None
-) -> RoomStateResponse:
+class RenderedRoomState(NamedTuple):
+    """A /state response already serialized to JSON bytes."""
+    version: int
+    has_update: bool
+    body: bytes
+
+
+class SharedRoomState:
     """
-    Build a snapshot of the room suitable for short polling consumers.
-    If the client's version is up-to-date, only returns has_update=False.
+    Room-wide part of a snapshot, computed once per state_version.
+
+    Holds the pre-serialized JSON of everything that is identical for all
+    players (room, roster, round progress) plus lookup tables the per-player
+    overlay reads from, so personalizing a snapshot costs no queries.
     """
-    room: Optional[Room] = db.query(Room).filter(Room.id == room_id).first()
-    if not room:
-        raise RoomNotFound(room_id)
 
-    current_version = room.state_version or 0
-    client_version = client_version or 0
+    __slots__ = (
+        "version",
+        "room_json",
+        "players_json",
+        "round_json",
+        "round_id",
+        "is_message_round",
+        "indicators_assigned",
+        "display_names",
+        "opponents",
+        "actions",
+        "history",
+        "totals",
+        "indicators",
+        "messages",
+    )
+
+    def __init__(self, version: int):
+        self.version = version
+        self.room_json = b"null"
+        self.players_json = b"[]"
+        self.round_json: Optional[bytes] = None
+        self.round_id: Optional[str] = None
+        self.is_message_round = False
+        self.indicators_assigned = False
+        self.display_names: Dict[str, str] = {}
+        # player_id -> opponent_id (pairs are fixed for the whole game)
+        self.opponents: Dict[str, str] = {}
+        # (round_id, player_id) -> (choice, payoff)
+        self.actions: Dict[Tuple[str, str], Tuple[Any, Optional[int]]] = {}
+        # player_id -> [(round_number, round_id)] of rounds with a calculated payoff
+        self.history: Dict[str, List[Tuple[int, str]]] = {}
+        self.totals: Dict[str, int] = {}
+        self.indicators: Dict[str, str] = {}
+        # receiver_id -> serialized MessageStatePayload of the current round
+        # (message rounds only); plain bytes, never ORM objects, because the
+        # cache outlives the session that built it
+        self.messages: Dict[str, bytes] = {}
+
 
-    if client_version >= current_version:
-        return RoomStateResponse(version=current_version, has_update=False)
+_players_adapter = TypeAdapter(List[PlayerStatePayload])
+_history_adapter = TypeAdapter(List[RoundHistoryEntry])
+
+# RoundStatePayload fields that depend on who is asking
+_PERSONAL_ROUND_FIELDS = {
+    "your_choice",
+    "opponent_choice",
+    "your_payoff",
+    "opponent_payoff",
+    "opponent_display_name",
+}
+
+
+def _json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _build_shared_state(db: Session, room: Room) -> SharedRoomState:
+    """Load everything room-wide for the current version in a fixed number of queries."""
+    room_id = room.id
+    shared = SharedRoomState(room.state_version or 0)
 
     players = db.query(Player).filter(Player.room_id == room_id).all()
-    player_count = len([p for p in players if not p.is_host])
-    player_payloads = [
-        PlayerStatePayload(
-            player_id=p.id,
-            display_name=p.display_name,
-            is_host=p.is_host
-        )
+    shared.display_names = {p.id: p.display_name for p in players}
+    shared.players_json = _players_adapter.dump_json([
+        PlayerStatePayload(player_id=p.id, display_name=p.display_name, is_host=p.is_host)
         for p in players
-    ]
+    ])
+    shared.room_json = RoomStatusResponse(
+        room_id=room.id,
+        code=room.code,
+        status=room.status,
+        current_round=room.current_round,
+        player_count=sum(1 for p in players if not p.is_host)
+    ).model_dump_json().encode()
 
-    round_payload: Optional[RoundStatePayload] = None
-    message_payload: Optional[MessageStatePayload] = None
-    indicator_symbol: Optional[str] = None
-    indicators_ready = indicators_already_assigned(room_id, db)
-    player_history: Optional[list] = None
-    player_total_payoff: Optional[int] = None
+    shared.indicators = dict(
+        db.query(Indicator.player_id, Indicator.symbol)
+        .filter(Indicator.room_id == room_id)
+        .all()
+    )
+    shared.indicators_assigned = bool(shared.indicators)
+
+    for player1_id, player2_id in (
+        db.query(Pair.player1_id, Pair.player2_id)
+        .filter(Pair.room_id == room_id)
+        .all()
+    ):
+        shared.opponents[player1_id] = player2_id
+        shared.opponents[player2_id] = player1_id
+
+    for player_id, round_id, choice, payoff, round_number in (
+        db.query(Action.player_id, Action.round_id, Action.choice, Action.payoff, Round.round_number)
+        .join(Round, Action.round_id == Round.id)
+        .filter(Action.room_id == room_id)
+        .order_by(Round.round_number)
+        .all()
+    ):
+        shared.actions[(round_id, player_id)] = (choice, payoff)
+        if payoff is not None:
+            shared.history.setdefault(player_id, []).append((round_number, round_id))
+            shared.totals[player_id] = shared.totals.get(player_id, 0) + payoff
 
     current_round: Optional[Round] = None
     if room.current_round > 0:
@@ -114,112 +398,349 @@ def build_room_state(
         ).first()
 
     if current_round:
-        # Collect all submitted actions with player info
-        submitted_actions_data = db.query(Action).filter(
-            Action.round_id == current_round.id
-        ).all()
-        submitted_player_ids = {action.player_id for action in submitted_actions_data}
-
-        # Get all players in this round from pairs
-        pairs = get_pairs_in_round(current_round.id, db)
-        all_round_player_ids = set()
-        for pair in pairs:
-            all_round_player_ids.add(pair.player1_id)
-            all_round_player_ids.add(pair.player2_id)
-
-        total_players = len(all_round_player_ids)
-        submitted_actions = len(submitted_player_ids)
-
-        # Build player submission status list
-        from schemas import PlayerSubmissionStatus
-        player_submissions = []
-        for player in players:
-            if player.id in all_round_player_ids and not player.is_host:
-                player_submissions.append(PlayerSubmissionStatus(
-                    player_id=player.id,
-                    display_name=player.display_name,
-                    submitted=(player.id in submitted_player_ids)
-                ))
-
-        round_payload = RoundStatePayload(
+        shared.round_id = current_round.id
+        shared.is_message_round = is_message_round(current_round.round_number)
+
+        submitted_player_ids = {
+            player_id for (round_id, player_id) in shared.actions if round_id == current_round.id
+        }
+
+        player_submissions = [
+            PlayerSubmissionStatus(
+                player_id=p.id,
+                display_name=p.display_name,
+                submitted=(p.id in submitted_player_ids)
+            )
+            for p in players
+            if p.id in shared.opponents and not p.is_host
+        ]
+
+        shared.round_json = RoundStatePayload(
             round_number=current_round.round_number,
             phase=current_round.phase,
             status=current_round.status,
-            submitted_actions=submitted_actions,
-            total_players=total_players,
+            submitted_actions=current_round.submitted_actions,
+            total_players=current_round.expected_actions,
             player_submissions=player_submissions
-        )
+        ).model_dump_json(exclude=_PERSONAL_ROUND_FIELDS).encode()
+
+        if shared.is_message_round:
+            shared.messages = {
+                receiver_id: MessageStatePayload(
+                    round_number=current_round.round_number,
+                    content=content,
+                    from_player_id=sender_id,
+                    from_display_name=shared.display_names.get(sender_id, "Unknown")
+                ).model_dump_json().encode()
+                for receiver_id, sender_id, content in (
+                    db.query(Message.receiver_id, Message.sender_id, Message.content)
+                    .filter(Message.round_id == current_round.id)
+                    .all()
+                )
+            }
+
+    return shared
+
+
+def _player_history(shared: SharedRoomState, player_id: str) -> List[RoundHistoryEntry]:
+    """Same entries as history_service.get_player_round_history, from the shared tables."""
+    entries = []
+    for round_number, round_id in shared.history.get(player_id, []):
+        choice, payoff = shared.actions[(round_id, player_id)]
+        entry = RoundHistoryEntry(round_number=round_number, your_choice=choice, your_payoff=payoff)
+
+        opponent_id = shared.opponents.get(player_id)
+        opponent_action = shared.actions.get((round_id, opponent_id)) if opponent_id else None
+        if opponent_action:
+            entry.opponent_choice, entry.opponent_payoff = opponent_action
+            entry.opponent_display_name = shared.display_names.get(opponent_id)
+
+        entries.append(entry)
+    return entries
+
 
+def _compose_state_json(shared: SharedRoomState, player_id: Optional[str]) -> bytes:
+    """
+    Splice the shared JSON with the per-player overlay.
+    Produces the same document as RoomStateResponse(has_update=True).
+    """
+    version = str(shared.version).encode()
+    round_id = shared.round_id
+
+    if shared.round_json is None:
+        round_json = b"null"
+    else:
+        personal = dict.fromkeys(_PERSONAL_ROUND_FIELDS)
         if player_id:
-            player_action = db.query(Action).filter(
-                Action.round_id == current_round.id,
-                Action.player_id == player_id
-            ).first()
-            if player_action:
-                round_payload.your_choice = player_action.choice
-                round_payload.your_payoff = player_action.payoff
-
-            try:
-                opponent_id = get_opponent_id(current_round.id, player_id, db)
-                opponent = db.query(Player).filter(Player.id == opponent_id).first()
-                if opponent:
-                    round_payload.opponent_display_name = opponent.display_name
-
-                opponent_action = db.query(Action).filter(
-                    Action.round_id == current_round.id,
-                    Action.player_id == opponent_id
-                ).first()
+            own = shared.actions.get((round_id, player_id))
+            if own:
+                personal["your_choice"], personal["your_payoff"] = own
+
+            opponent_id = shared.opponents.get(player_id)
+            if opponent_id:
+                personal["opponent_display_name"] = shared.display_names.get(opponent_id)
+                opponent_action = shared.actions.get((round_id, opponent_id))
                 if opponent_action:
-                    round_payload.opponent_choice = opponent_action.choice
-                    round_payload.opponent_payoff = opponent_action.payoff
-
-            except ValueError:
-                logger.debug("Opponent not found yet for player %s in round %s", player_id, current_round.id)
-
-            if is_message_round(current_round.round_number):
-                message = db.query(Message).filter(
-                    Message.round_id == current_round.id,
-                    Message.receiver_id == player_id
-                ).first()
-                if message:
-                    sender = next((p for p in players if p.id == message.sender_id), None)
-                    message_payload = MessageStatePayload(
-                        round_number=current_round.round_number,
-                        content=message.content,
-                        from_player_id=message.sender_id,
-                        from_display_name=sender.display_name if sender else "Unknown"
-                    )
-
-            # Only try indicator lookup when one should exist
-            try:
-                indicator_symbol = get_player_indicator(player_id, db)
-            except ValueError:
-                indicator_symbol = None
+                    personal["opponent_choice"], personal["opponent_payoff"] = opponent_action
+            else:
+                logger.debug("Opponent not found yet for player %s in round %s", player_id, round_id)
+        round_json = shared.round_json[:-1] + b"," + _json(personal)[1:]
 
+    indicator_symbol = None
+    message_json = b"null"
+    history_json = b"null"
+    total_json = b"null"
     if player_id:
-        player_history = get_player_round_history(room_id, player_id, db)
-        player_total_payoff = calculate_total_payoff(player_id, db)
-
-    state_payload = RoomStatePayload(
-        room=RoomStatusResponse(
-            room_id=room.id,
-            code=room.code,
-            status=room.status,
-            current_round=room.current_round,
-            player_count=player_count
-        ),
-        players=player_payloads,
-        round=round_payload,
-        indicator_symbol=indicator_symbol,
-        indicators_assigned=indicators_ready,
-        message=message_payload,
-        player_history=player_history,
-        player_total_payoff=player_total_payoff,
-        version=current_version,
-    )
+        if round_id:
+            indicator_symbol = shared.indicators.get(player_id)
+            message_json = shared.messages.get(player_id, b"null")
+
+        history_json = _history_adapter.dump_json(_player_history(shared, player_id))
+        total_json = str(shared.totals.get(player_id, 0)).encode()
+
+    return b"".join((
+        b'{"version":', version,
+        b',"has_update":true,"data":{"room":', shared.room_json,
+        b',"players":', shared.players_json,
+        b',"round":', round_json,
+        b',"indicator_symbol":', _json(indicator_symbol),
+        b',"indicators_assigned":', b"true" if shared.indicators_assigned else b"false",
+        b',"message":', message_json,
+        b',"player_history":', history_json,
+        b',"player_total_payoff":', total_json,
+        b',"version":', version,
+        b'},"base_version":null,"patch":null}',
+    ))
+
+
+def render_room_state(
+    db: Session,
+    room_id: str,
+    client_version: Optional[int] = None,
+    player_id: Optional[str] = None,
+    delta: bool = False
+) -> RenderedRoomState:
+    """
+    Build a snapshot of the room suitable for short polling consumers,
+    serialized to JSON bytes. If the client's version is up-to-date,
+    only returns has_update=False.
+
+    The room-wide section is built once per state_version and cached
+    under "shared"; each player's snapshot is that section plus a small
+    overlay, cached under (room_id, state_version, player_id).
+
+    The session is only read from; it may be rolled back while waiting
+    for a concurrent build of the same version, so it must not hold
+    uncommitted changes.
+
+    With delta=True the response carries a JSON Patch from the client's
+    version instead of `data`, when that version is still in state_history
+    and the patch is actually smaller than the full snapshot.
+    """
+    room = db.execute(_room_query(room_id)).scalar_one_or_none()
+    unchanged = _check_room(room, room_id, client_version)
+    if unchanged is not None:
+        return unchanged
+
+    # Read before _snapshot_json: a single-flight follower rolls the session
+    # back while it waits, and touching `room` afterwards would reload a
+    # newer version than the one the body was built from
+    current_version = room.state_version or 0
+    body = _snapshot_json(db, room, player_id)
+    return _finish_render(room_id, player_id, client_version or 0, current_version, body, delta)
+
+
+def _room_query(room_id: str):
+    """The Room SELECT shared by the sync and async render paths."""
+    return select(Room).where(Room.id == room_id)
 
-    return RoomStateResponse(
-        version=current_version,
-        has_update=True,
-        data=state_payload
+
+def _check_room(room: Optional[Room], room_id: str, client_version: Optional[int]) -> Optional[RenderedRoomState]:
+    """
+    Raise RoomNotFound for a missing room; return the has_update=False
+    state when the client is up to date, else None (a snapshot is needed).
+    """
+    if not room:
+        raise RoomNotFound(room_id)
+
+    current_version = room.state_version or 0
+    if (client_version or 0) >= current_version:
+        return _unchanged_state(current_version)
+    return None
+
+
+def _unchanged_state(version: int) -> RenderedRoomState:
+    return RenderedRoomState(
+        version,
+        False,
+        b'{"version":%d,"has_update":false,"data":null,"base_version":null,"patch":null}' % version
     )
+
+
+def _finish_render(
+    room_id: str,
+    player_id: Optional[str],
+    client_version: int,
+    current_version: int,
+    body: bytes,
+    delta: bool
+) -> RenderedRoomState:
+    """Record the snapshot for later deltas and pick the full body or the patch."""
+    state_history.record(room_id, player_id, current_version, body)
+
+    if delta and client_version > 0:
+        base = state_history.get(room_id, player_id, client_version)
+        if base is not None:
+            delta_body = _delta_json(base, body, client_version, current_version)
+            if len(delta_body) < len(body):
+                return RenderedRoomState(current_version, True, delta_body)
+
+    return RenderedRoomState(current_version, True, body)
+
+
+def _cached_snapshot(room_id: str, version: int, player_id: Optional[str]):
+    """The cached player body (bytes), else the cached SharedRoomState, else None."""
+    if player_id:
+        cached = snapshot_cache.get(room_id, version, player_id)
+        if isinstance(cached, bytes):
+            return cached
+
+    shared = snapshot_cache.get(room_id, version)
+    if isinstance(shared, SharedRoomState):
+        return shared
+    return None
+
+
+def _compose_and_cache(shared: SharedRoomState, room_id: str, version: int, player_id: Optional[str]) -> bytes:
+    body = _compose_state_json(shared, player_id)
+    if player_id:
+        snapshot_cache.put(room_id, version, player_id, body)
+    return body
+
+
+def _snapshot_json(db: Session, room: Room, player_id: Optional[str]) -> bytes:
+    """Full has_update=True snapshot for the room's current version, via the cache."""
+    room_id = room.id
+    current_version = room.state_version or 0
+
+    shared = _cached_snapshot(room_id, current_version, player_id)
+    if isinstance(shared, bytes):
+        return shared
+
+    if shared is None:
+        def build() -> SharedRoomState:
+            built = _build_shared_state(db, room)
+            snapshot_cache.put(room_id, current_version, None, built)
+            return built
+
+        # Everyone polls right after a publish: the first request builds the
+        # shared section, concurrent ones wait for it. Followers end their
+        # read transaction first so waiting does not hold a pooled connection.
+        shared = snapshot_flights.do((room_id, current_version), build, before_wait=db.rollback)
+
+    return _compose_and_cache(shared, room_id, current_version, player_id)
+
+
+async def _snapshot_json_async(db: AsyncSession, room: Room, player_id: Optional[str]) -> bytes:
+    """_snapshot_json for the async engine: waiting on a concurrent build never blocks the event loop."""
+    room_id = room.id
+    current_version = room.state_version or 0
+
+    shared = _cached_snapshot(room_id, current_version, player_id)
+    if isinstance(shared, bytes):
+        return shared
+
+    if shared is None:
+        async def build() -> SharedRoomState:
+            # The builder is plain ORM code; run_sync drives it on this
+            # session's async connection without a worker thread
+            built = await db.run_sync(lambda session: _build_shared_state(session, room))
+            snapshot_cache.put(room_id, current_version, None, built)
+            return built
+
+        shared = await snapshot_flights.do_async((room_id, current_version), build, before_wait=db.rollback)
+
+    return _compose_and_cache(shared, room_id, current_version, player_id)
+
+
+def _delta_json(base: bytes, body: bytes, base_version: int, version: int) -> bytes:
+    """has_update=True response whose `patch` turns the base snapshot's data into the current one."""
+    patch = make_patch(json.loads(base)["data"], json.loads(body)["data"])
+    return b"".join((
+        b'{"version":', str(version).encode(),
+        b',"has_update":true,"data":null,"base_version":', str(base_version).encode(),
+        b',"patch":', _json(patch),
+        b"}",
+    ))
+
+
+def build_room_state(
+    db: Session,
+    room_id: str,
+    client_version: Optional[int] = None,
+    player_id: Optional[str] = None
+) -> RoomStateResponse:
+    """render_room_state, parsed back into the response model."""
+    rendered = render_room_state(db, room_id, client_version, player_id)
+    return RoomStateResponse.model_validate_json(rendered.body)
+
+
+def load_room_state(
+    room_id: str,
+    client_version: Optional[int] = None,
+    player_id: Optional[str] = None,
+    delta: bool = False,
+    primary: bool = False
+) -> RenderedRoomState:
+    """
+    render_room_state with a short-lived session of its own, on the read
+    replica unless primary=True.
+    Used by async endpoints so the connection is returned to the pool
+    before they start waiting for the next version.
+    """
+    db = SessionLocal() if primary else ReadSessionLocal()
+    try:
+        return render_room_state(
+            db,
+            room_id=room_id,
+            client_version=client_version,
+            player_id=player_id,
+            delta=delta
+        )
+    finally:
+        db.close()
+
+
+async def fetch_state_version_async(room_id: str, client_version: int = 0) -> Optional[int]:
+    """fetch_state_version on the async engine (requires database.async_engine)."""
+    version = peek_state_version(room_id, client_version)
+    if version is not None:
+        return version
+
+    async with async_engine.connect() as conn:
+        version = (await conn.execute(_state_version_query(room_id))).scalar()
+
+    return _observe_fetched(room_id, version)
+
+
+async def load_room_state_async(
+    room_id: str,
+    client_version: Optional[int] = None,
+    player_id: Optional[str] = None,
+    delta: bool = False
+) -> RenderedRoomState:
+    """
+    load_room_state on the async engine (requires database.AsyncSessionLocal).
+    Same output and caches as the sync path; a poll that finds a cached
+    snapshot never touches a thread.
+    """
+    async with AsyncSessionLocal() as db:
+        room = (await db.execute(_room_query(room_id))).scalar_one_or_none()
+        unchanged = _check_room(room, room_id, client_version)
+        if unchanged is not None:
+            return unchanged
+
+        current_version = room.state_version or 0
+        body = await _snapshot_json_async(db, room, player_id)
+
+    return _finish_render(room_id, player_id, client_version or 0, current_version, body, delta)
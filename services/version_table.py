@@ -0,0 +1,64 @@
+"""
+Room version table: compact in-memory map of room_id -> state_version.
+
+Answers the hottest question in the system ("is there anything newer than
+version X?") without touching the database. Entries come from two places:
+- bumps committed by this process (state_service after_commit hook)
+- single-column SELECTs done by the fast path on a miss
+
+Entries expire after a short TTL so bumps committed by other worker
+processes are still noticed within ttl_seconds.
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Optional, Tuple
+
+from database import settings
+
+
+class RoomVersionTable:
+    """Thread-safe, bounded, monotonic version map."""
+
+    def __init__(self, max_rooms: int = 10000, ttl_seconds: float = 1.0):
+        self.max_rooms = max_rooms
+        self.ttl_seconds = ttl_seconds
+        self._versions: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, room_id: str) -> Optional[int]:
+        """Fresh version for the room, or None on a miss / expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(room_id)
+            if entry is None:
+                return None
+            version, expires_at = entry
+            if expires_at < now:
+                return None
+            return version
+
+    def observe(self, room_id: str, version: int) -> int:
+        """
+        Record a version seen in the database or committed by this process.
+        Versions only move forward, so an out-of-order observation never
+        rolls an entry back. Returns the version now stored.
+        """
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            entry = self._versions.get(room_id)
+            if entry is not None:
+                version = max(version, entry[0])
+            self._versions[room_id] = (version, expires_at)
+            self._versions.move_to_end(room_id)
+
+            while len(self._versions) > self.max_rooms:
+                self._versions.popitem(last=False)
+        return version
+
+    def forget(self, room_id: str) -> None:
+        with self._lock:
+            self._versions.pop(room_id, None)
+
+
+room_versions = RoomVersionTable(ttl_seconds=settings.state_version_ttl_seconds)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+測試 core/event_sink.py：BUFFERED 事件的批次寫入與同步退回路徑
+
+執行：
+    python -m pytest test_event_sink.py
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import core.event_sink
+from core.event_sink import EventSink, record_event
+from models import EventLog
+
+BUFFERED_TYPE = "ROUND_STATE_CHANGED"
+
+
+@pytest.fixture
+def room_id(make_game):
+    """在 sink 啟動之前建立房間，建立過程的事件不會留在緩衝裡"""
+    room_id, _, _ = make_game()
+    return room_id
+
+
+@pytest.fixture
+def sink(room_id, monkeypatch):
+    """已啟動的 sink；flush 間隔很長，只有測試手動呼叫 flush() 才會寫入"""
+    sink = EventSink(flush_interval=60, max_batch=500)
+    monkeypatch.setattr(core.event_sink, "event_sink", sink)
+    sink.start()
+    yield sink
+    sink.stop()
+
+
+def logged(db, room_id):
+    db.expire_all()
+    rows = db.query(EventLog).filter(
+        EventLog.room_id == room_id,
+        EventLog.event_type == BUFFERED_TYPE
+    ).order_by(EventLog.id).all()
+    return [row.data["n"] for row in rows]
+
+
+def row(room_id, n, event_type=BUFFERED_TYPE):
+    return {"room_id": room_id, "event_type": event_type, "data": {"n": n}, "created_at": datetime.utcnow()}
+
+
+def test_buffered_events_are_written_in_order(db, room_id, sink):
+    for n in range(5):
+        record_event(db, room_id, BUFFERED_TYPE, {"n": n})
+    db.commit()
+    assert logged(db, room_id) == []
+
+    assert sink.flush() == 5
+    assert logged(db, room_id) == [0, 1, 2, 3, 4]
+
+
+def test_rolled_back_events_are_discarded(db, room_id, sink):
+    record_event(db, room_id, BUFFERED_TYPE, {"n": 0})
+    db.rollback()
+
+    assert sink.flush() == 0
+    assert sink.stats()["buffered"] == 0
+
+
+def test_bad_row_does_not_drop_the_batch(db, room_id, sink):
+    sink.submit([row(room_id, 0), row(room_id, 1, event_type=None), row(room_id, 2)])
+
+    assert sink.flush() == 2
+    assert sink.stats()["dropped"] == 1
+    assert logged(db, room_id) == [0, 2]
+
+
+def test_unavailable_database_keeps_events(db, room_id, sink, monkeypatch):
+    sink.submit([row(room_id, 0), row(room_id, 1)])
+
+    def unavailable(rows):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(sink, "_insert", unavailable)
+    assert sink.flush() == 0
+    assert sink.stats()["buffered"] == 2
+
+    monkeypatch.delattr(sink, "_insert")
+    assert sink.flush() == 2
+    assert logged(db, room_id) == [0, 1]
+
+
+def test_unbuffered_path_writes_with_the_transaction(db, room_id):
+    # sink 沒啟動（腳本、測試）：BUFFERED 事件和業務資料一起 commit
+    assert not core.event_sink.event_sink.running
+    record_event(db, room_id, BUFFERED_TYPE, {"n": 0})
+    db.commit()
+    assert logged(db, room_id) == [0]
+
+    record_event(db, room_id, BUFFERED_TYPE, {"n": 1})
+    db.rollback()
+    assert logged(db, room_id) == [0]
+
+
+def test_submit_after_stop_writes_immediately(db, room_id):
+    sink = EventSink(flush_interval=60)
+    sink.submit([row(room_id, 0)])
+    assert sink.stats() == {"buffered": 0, "written": 1, "dropped": 0}
+    assert logged(db, room_id) == [0]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+測試 core/finalize_worker.py：重試用完的回合不會永遠停在 WAITING_ACTIONS
+
+執行：
+    python -m pytest test_finalize_worker.py
+"""
+import time
+
+import pytest
+
+import core.finalize_worker
+from core.finalize_worker import FINALIZE_MAX_ATTEMPTS, FinalizeWorker
+from core.round_manager import RoundManager
+from models import Choice, Round, RoundStatus
+
+
+@pytest.fixture
+def failing_finalize(monkeypatch):
+    """讓 try_finalize_round 一直失敗；返回被呼叫的 round_id 清單與還原函式"""
+    monkeypatch.setattr(core.finalize_worker, "FINALIZE_RETRY_DELAY_SECONDS", 0)
+    original = RoundManager.try_finalize_round
+    calls = []
+
+    def fail(db, round_id):
+        calls.append(round_id)
+        raise RuntimeError("finalize failed")
+
+    monkeypatch.setattr(RoundManager, "try_finalize_round", staticmethod(fail))
+
+    def restore():
+        monkeypatch.setattr(RoundManager, "try_finalize_round", staticmethod(original))
+
+    return calls, restore
+
+
+def submitted_round(db, make_game) -> str:
+    """全員已提交、還沒結算的回合"""
+    _, round_id, player_ids = make_game()
+    for player_id in player_ids:
+        RoundManager.submit_action(db, round_id, player_id, Choice.TURN)
+    return round_id
+
+
+def round_status(db, round_id: str) -> RoundStatus:
+    db.expire_all()
+    return db.get(Round, round_id).status
+
+
+def test_exhausted_round_is_recovered_by_sweep(db, make_game, failing_finalize):
+    calls, restore = failing_finalize
+    round_id = submitted_round(db, make_game)
+    worker = FinalizeWorker(num_threads=1, sweep_interval=0)
+
+    worker.start()  # 啟動時的 sweep 會排入這個回合
+    try:
+        worker.join()
+        assert calls.count(round_id) == FINALIZE_MAX_ATTEMPTS
+        assert round_status(db, round_id) == RoundStatus.WAITING_ACTIONS
+
+        restore()
+        assert worker.sweep() >= 1
+        worker.join()
+    finally:
+        worker.stop()
+
+    assert round_status(db, round_id) == RoundStatus.READY_TO_PUBLISH
+
+
+def test_periodic_sweep(db, make_game, failing_finalize):
+    calls, restore = failing_finalize
+    round_id = submitted_round(db, make_game)
+    worker = FinalizeWorker(num_threads=1, sweep_interval=0.05)
+
+    worker.start()
+    try:
+        worker.join()
+        assert round_id in calls
+        restore()
+
+        deadline = time.monotonic() + 5
+        while round_status(db, round_id) != RoundStatus.READY_TO_PUBLISH:
+            assert time.monotonic() < deadline, "periodic sweep never finalized the round"
+            time.sleep(0.05)
+    finally:
+        worker.stop()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+測試 immutable ETag：命中時回 304，但房間被刪除或 player_id 不對時仍回 404
+
+執行：
+    python -m pytest test_http_cache.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import Room
+from utils.http_cache import make_etag
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def get_pair(client, room_id, player_id, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get(f"/api/rooms/{room_id}/rounds/1/pair", params={"player_id": player_id}, headers=headers)
+
+
+def test_pair_revalidates_with_304(client, make_game):
+    room_id, _, player_ids = make_game()
+    response = get_pair(client, room_id, player_ids[0])
+    assert response.status_code == 200
+
+    cached = get_pair(client, room_id, player_ids[0], response.headers["ETag"])
+    assert cached.status_code == 304
+
+
+def test_wildcard_does_not_match(client, make_game):
+    room_id, _, player_ids = make_game()
+    response = get_pair(client, room_id, player_ids[0], "*")
+    assert response.status_code == 200
+    assert response.json()["opponent_id"]
+
+
+def test_unknown_player_is_404_even_with_matching_etag(client, make_game):
+    room_id, _, _ = make_game()
+    etag = make_etag("pair", room_id, 1, "no-such-player")
+    assert get_pair(client, room_id, "no-such-player", etag).status_code == 404
+
+    summary = client.get(
+        f"/api/rooms/{room_id}/summary",
+        params={"player_id": "no-such-player"},
+        headers={"If-None-Match": make_etag("summary", room_id, "no-such-player")}
+    )
+    assert summary.status_code == 404
+
+
+def test_deleted_room_is_404_even_with_cached_etag(client, db, make_game):
+    room_id, _, player_ids = make_game()
+    etag = get_pair(client, room_id, player_ids[0]).headers["ETag"]
+    summary_etag = make_etag("summary", room_id, "shared")
+
+    db.delete(db.get(Room, room_id))
+    db.commit()
+
+    assert get_pair(client, room_id, player_ids[0], etag).status_code == 404
+    summary = client.get(f"/api/rooms/{room_id}/summary", headers={"If-None-Match": summary_etag})
+    assert summary.status_code == 404
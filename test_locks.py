@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+測試 core/locks.py 的 process 鎖後端（SQLite 模式）：同一個房間互斥、不同房間互不影響
+
+執行：
+    python -m pytest test_locks.py
+"""
+import threading
+import time
+
+import pytest
+
+import core.locks
+from core.exceptions import LockTimeout, RoundNotFound
+from core.locks import ProcessLockBackend, with_room_lock, with_round_lock
+from database import SessionLocal
+
+HOLD_SECONDS = 0.3
+
+
+@pytest.fixture(autouse=True)
+def process_backend(monkeypatch):
+    backend = ProcessLockBackend(timeout=5)
+    monkeypatch.setattr(core.locks, "lock_backend", backend)
+    return backend
+
+
+def hold_lock(lock, acquired: threading.Event, log: list, name: str):
+    """在另一個 thread 取得鎖，持有 HOLD_SECONDS 後 commit"""
+    db = SessionLocal()
+    try:
+        lock(db)
+        log.append(f"{name} acquired")
+        acquired.set()
+        time.sleep(HOLD_SECONDS)
+        log.append(f"{name} released")
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_second(lock, log: list, name: str):
+    db = SessionLocal()
+    try:
+        lock(db)
+        log.append(f"{name} acquired")
+        db.commit()
+    finally:
+        db.close()
+
+
+def race(first_lock, second_lock):
+    """first 先取得鎖，second 接著嘗試；返回事件順序"""
+    log = []
+    acquired = threading.Event()
+    first = threading.Thread(target=hold_lock, args=(first_lock, acquired, log, "first"))
+    first.start()
+    assert acquired.wait(5)
+    second = threading.Thread(target=run_second, args=(second_lock, log, "second"))
+    second.start()
+    first.join()
+    second.join()
+    return log
+
+
+def test_same_room_serializes(make_game):
+    room_id, _, _ = make_game()
+    log = race(
+        lambda db: with_room_lock(room_id, db).first(),
+        lambda db: with_room_lock(room_id, db).first(),
+    )
+    assert log == ["first acquired", "first released", "second acquired"]
+
+
+def test_round_lock_waits_for_its_room(make_game):
+    room_id, round_id, _ = make_game()
+    log = race(
+        lambda db: with_room_lock(room_id, db).first(),
+        lambda db: with_round_lock(round_id, db).first(),
+    )
+    assert log == ["first acquired", "first released", "second acquired"]
+
+
+def test_different_rooms_do_not_block(make_game):
+    room1, _, _ = make_game()
+    room2, _, _ = make_game()
+    log = race(
+        lambda db: with_room_lock(room1, db).first(),
+        lambda db: with_room_lock(room2, db).first(),
+    )
+    assert log == ["first acquired", "second acquired", "first released"]
+
+
+def test_lock_is_reentrant_within_a_transaction(db, make_game):
+    room_id, round_id, _ = make_game()
+    assert with_room_lock(room_id, db).first() is not None
+    assert with_round_lock(round_id, db).first() is not None
+    db.commit()
+
+
+def test_lock_timeout(make_game, process_backend):
+    room_id, _, _ = make_game()
+    process_backend.timeout = 0.05
+    errors = []
+
+    def second(db):
+        try:
+            with_room_lock(room_id, db).first()
+        except LockTimeout as e:
+            errors.append(e)
+
+    race(lambda db: with_room_lock(room_id, db).first(), second)
+    assert len(errors) == 1
+
+
+def test_unknown_round_raises_without_holding_locks(db):
+    with pytest.raises(RoundNotFound):
+        with_round_lock("no-such-round", db)
+    assert not db.info.get("held_room_locks")
+    db.rollback()
+
+
+def test_round_lock_after_cache_clear(db, make_game, process_backend):
+    room_id, round_id, _ = make_game()
+    with_round_lock(round_id, db).first()
+    db.commit()
+
+    process_backend._round_rooms.clear()
+    with_round_lock(round_id, db).first()
+    assert set(db.info["held_room_locks"]) == {room_id}
+    db.commit()
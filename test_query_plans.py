@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+熱路徑查詢的 EXPLAIN QUERY PLAN 檢查（SQLite）
+
+在記憶體資料庫上實際跑一遍輪詢、提交、結算、公布、歷史、補發事件等流程，
+記錄過程中送出的每一條 SELECT / UPDATE / DELETE，
+再逐條 EXPLAIN QUERY PLAN：只要有任何一條對資料表做全表掃描就失敗。
+
+（沒有索引時，這些查詢的成本會隨「所有房間」的資料量成長，而不是只跟單一房間的大小有關）
+
+執行：
+    python -m pytest test_query_plans.py
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.round_manager import RoundManager
+from core.room_manager import RoomManager
+from core.ws_hub import fetch_events_since
+from database import Base
+from models import Action, Choice, Message, Player, Room
+from services.history_service import get_player_round_history
+from services.indicator_service import assign_indicators, get_player_indicator
+from services.pairing_service import count_room_pairs, get_opponent_id, get_pairs_in_round
+from services.payoff_service import calculate_total_payoff, get_unsubmitted_player_ids
+from services.state_service import render_room_state, summarize_changed_rooms
+
+PLAYERS = 4
+
+TABLES = set(Base.metadata.tables)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@contextmanager
+def capture_statements(db):
+    """記錄區塊內送出的 (statement, parameters)"""
+    engine = db.get_bind()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0]
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(db, statement, parameters):
+    """EXPLAIN QUERY PLAN 裡對資料表的全表掃描（子查詢 / 暫存結果的 SCAN 不算）"""
+    rows = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters
+    ).all()
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        if words[0] != "SCAN" or "USING" in words:
+            continue
+        # "SCAN rounds" / "SCAN actions AS actions_1"
+        if words[1] in TABLES:
+            scans.append(detail)
+    return scans
+
+
+def play_one_room(db):
+    """建立房間、加入玩家並開始第一回合；返回 (room_id, round1_id, player_ids)"""
+    room, host = RoomManager.create_room(db)
+    for i in range(PLAYERS):
+        db.add(Player(room_id=room.id, nickname=f"p{i}", display_name=f"p{i}"))
+    db.commit()
+
+    room, round1 = RoomManager.start_game_with_first_round(db, room.id)
+    player_ids = [p.id for p in db.query(Player).filter(Player.room_id == room.id, Player.is_host == False)]
+    return room.id, round1.id, player_ids
+
+
+def check_no_full_scans(db, statements):
+    offenders = []
+    for statement, parameters in statements:
+        if statement.split(None, 1)[0].upper() not in ("SELECT", "UPDATE", "DELETE"):
+            continue
+        scans = full_scans(db, statement, parameters)
+        if scans:
+            offenders.append(f"{scans}\n    {statement}")
+    assert not offenders, "full table scans:\n" + "\n".join(offenders)
+
+
+def test_hot_queries_use_indexes(db):
+    # 其他房間的資料：確保查詢不是「剛好整張表只有一個房間」
+    play_one_room(db)
+
+    with capture_statements(db) as statements:
+        room_id, round_id, player_ids = play_one_room(db)
+
+        # 提交 / 結算 / 公布
+        for player_id in player_ids:
+            RoundManager.submit_and_try_finalize(db, round_id, player_id, Choice.TURN)
+        RoundManager.submit_and_try_finalize(db, round_id, player_ids[0], Choice.TURN)
+        RoundManager.publish_round(db, round_id)
+
+        # 第二回合：一半提交，其餘跳過
+        round2 = RoundManager.create_round(db, room_id)
+        RoundManager.submit_action(db, round2.id, player_ids[0], Choice.ACCELERATE)
+        get_unsubmitted_player_ids(round2.id, db)
+        RoundManager.skip_round(db, round2.id)
+
+        # 指標與訊息
+        assign_indicators(room_id, db)
+        db.commit()
+        get_player_indicator(player_ids[0], db)
+        receiver_id = get_opponent_id(round2.id, player_ids[0], db)
+        db.add(Message(room_id=room_id, round_id=round2.id, sender_id=player_ids[0],
+                       receiver_id=receiver_id, content="hi"))
+        db.commit()
+        db.query(Message).filter(Message.round_id == round2.id, Message.sender_id == player_ids[0]).first()
+        db.query(Message).filter(Message.round_id == round2.id, Message.receiver_id == receiver_id).first()
+
+        # 輪詢
+        render_room_state(db, room_id, 0, player_ids[0])
+        summarize_changed_rooms(db, {room_id: 0})
+        RoundManager.get_current_round(db, room_id)
+        RoundManager.get_round_by_number(db, room_id, 1)
+        RoomManager.get_player_count(db, room_id)
+
+        # 結果 / 歷史 / 統計
+        get_pairs_in_round(round_id, db)
+        count_room_pairs(room_id, db)
+        get_player_round_history(room_id, player_ids[0], db)
+        calculate_total_payoff(player_ids[0], db)
+        db.query(Action).filter(Action.room_id == room_id, Action.choice == Choice.ACCELERATE).count()
+
+        # 補發事件
+        fetch_events_since(db, room_id, 0)
+        db.rollback()
+
+    assert len(statements) > 20
+    check_no_full_scans(db, statements)
+
+
+def test_detects_full_scan(db):
+    """確認檢查本身有效：沒有索引的欄位會被抓到"""
+    with capture_statements(db) as statements:
+        db.query(Room).filter(Room.updated_at < Room.created_at).all()
+        db.query(Player).filter(Player.display_name == "X").all()
+
+    assert len(statements) == 2
+    with pytest.raises(AssertionError) as excinfo:
+        check_no_full_scans(db, statements)
+    assert "SCAN rooms" in str(excinfo.value)
+    assert "SCAN players" in str(excinfo.value)
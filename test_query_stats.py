@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+測試 core/query_stats.py：每個 request 的查詢數、Server-Timing header、route 彙總與查詢預算
+
+執行：
+    python -m pytest test_query_stats.py
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from core.exceptions import QueryBudgetExceeded
+from core.query_stats import QueryStatsMiddleware, query_stats
+from database import settings
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware)
+
+
+@app.get("/items/{count}")
+def run_queries(count: int):
+    with engine.connect() as conn:
+        for _ in range(count):
+            conn.execute(text("SELECT 1"))
+    return {"count": count}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "query_budget", 0)
+    monkeypatch.setattr(settings, "query_budget_routes", {})
+    monkeypatch.setattr(settings, "query_budget_action", "log")
+    query_stats.reset()
+    return TestClient(app, raise_server_exceptions=True)
+
+
+def test_headers_and_route_totals(client):
+    response = client.get("/items/3")
+    assert response.headers["X-Query-Count"] == "3"
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+    client.get("/items/5")
+    totals = query_stats.snapshot()["GET /items/{count}"]
+    assert totals["requests"] == 2
+    assert totals["statements"] == 8
+    assert totals["max_statements"] == 5
+
+
+def test_queries_outside_requests_are_not_counted(client):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert client.get("/items/0").headers["X-Query-Count"] == "0"
+
+
+def test_budget_logs_by_default(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "query_budget_routes", {"GET /items/{count}": 2})
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/items/3").status_code == 200
+    assert "budget 2" in caplog.text
+    assert query_stats.snapshot()["GET /items/{count}"]["over_budget"] == 1
+
+
+def test_budget_raises(client, monkeypatch):
+    monkeypatch.setattr(settings, "query_budget", 2)
+    monkeypatch.setattr(settings, "query_budget_action", "raise")
+    assert client.get("/items/2").status_code == 200
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/items/3")
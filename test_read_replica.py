@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+測試讀寫分離：PrimaryPins、get_read_db 的路由，以及 replica 落後時 /state 的行為
+
+primary 是 conftest 的 SQLite 檔案，replica 是另一個檔案，用 utils/sqlite_replica.py 手動複製，
+複製之前 replica 就是一個落後的快照
+
+執行：
+    python -m pytest test_read_replica.py
+"""
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import api.rooms
+import database
+import main
+import services.state_service
+from conftest import TEST_DIR
+from database import PrimaryPins, engine, get_read_db, primary_pins
+from models import Choice
+from utils.sqlite_replica import copy_database
+
+PRIMARY_PATH = engine.url.database
+REPLICA_PATH = os.path.join(TEST_DIR, "replica.db")
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """把讀取端換成 replica 檔案；返回 sync()，呼叫時 replica 追上 primary"""
+    def sync():
+        copy_database(PRIMARY_PATH, REPLICA_PATH)
+
+    sync()
+    read_engine = database._create_engine(f"sqlite:///{REPLICA_PATH}")
+    read_session = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    monkeypatch.setattr(database, "read_engine", read_engine)
+    monkeypatch.setattr(database, "ReadSessionLocal", read_session)
+    monkeypatch.setattr(services.state_service, "read_engine", read_engine)
+    monkeypatch.setattr(services.state_service, "ReadSessionLocal", read_session)
+    # async engine 連的是 primary，測試只走 sync 路徑
+    monkeypatch.setattr(api.rooms, "async_engine", None)
+    monkeypatch.setattr(primary_pins, "_pinned_until", {})
+    yield sync
+    read_engine.dispose()
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def bound_path(db) -> str:
+    return db.get_bind().url.database
+
+
+def test_pins_expire(replica):
+    pins = PrimaryPins(ttl_seconds=0.05)
+    pins.pin("p1")
+    assert pins.is_pinned("p1")
+    assert not pins.is_pinned("p2")
+    assert not pins.is_pinned(None)
+    time.sleep(0.1)
+    assert not pins.is_pinned("p1")
+
+
+def test_pin_is_noop_without_replica():
+    pins = PrimaryPins(ttl_seconds=60)
+    pins.pin("p1")
+    assert not pins.is_pinned("p1")
+
+
+def test_get_read_db_routes_pinned_players_to_primary(replica):
+    primary_pins.pin("writer")
+    for player_id, expected in (("writer", PRIMARY_PATH), ("reader", REPLICA_PATH), (None, REPLICA_PATH)):
+        dependency = get_read_db(player_id)
+        db = next(dependency)
+        assert bound_path(db) == expected
+        dependency.close()
+
+
+def test_pinned_player_reads_own_write(replica, client, make_game):
+    room_id, _, player_ids = make_game()
+    replica()
+    before = client.get(f"/api/rooms/{room_id}/state").json()["version"]
+
+    writer, reader = player_ids[0], player_ids[1]
+    response = client.post(
+        f"/api/rooms/{room_id}/rounds/1/action",
+        json={"player_id": writer, "choice": Choice.TURN.value}
+    )
+    assert response.status_code == 200
+
+    mine = client.get(f"/api/rooms/{room_id}/state", params={"player_id": writer}).json()
+    assert mine["version"] > before
+    assert mine["data"]["round"]["submitted_actions"] == 1
+
+    # 其他玩家讀 replica，還看不到這次提交
+    theirs = client.get(f"/api/rooms/{room_id}/state", params={"player_id": reader}).json()
+    assert theirs["version"] == before
+    assert theirs["data"]["round"]["submitted_actions"] == 0
+
+
+def test_long_poll_waits_for_lagging_replica(replica, client, make_game):
+    room_id, _, player_ids = make_game()
+    replica()
+    before = client.get(f"/api/rooms/{room_id}/state").json()["version"]
+
+    client.post(
+        f"/api/rooms/{room_id}/rounds/1/action",
+        json={"player_id": player_ids[0], "choice": Choice.TURN.value}
+    )
+    # 版本表已經是新版本，replica 0.5 秒後才追上
+    timer = threading.Timer(0.5, replica)
+    timer.start()
+    try:
+        body = client.get(
+            f"/api/rooms/{room_id}/state",
+            params={"version": before, "wait": 5}
+        ).json()
+    finally:
+        timer.join()
+
+    assert body["has_update"] is True
+    assert body["version"] > before
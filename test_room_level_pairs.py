@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+測試 migrations/004_room_level_pairs.py：舊資料中每回合重新洗牌的房間會被正規化成一組配對
+
+執行：
+    python -m pytest test_room_level_pairs.py
+"""
+import importlib.util
+import os
+
+from core.round_manager import RoundManager
+from models import Action, Choice, Pair, Round, RoundStatus
+from services.history_service import get_player_round_history
+from services.pairing_service import count_room_pairs, get_opponent_id, get_pairs_in_round
+from services.payoff_service import calculate_round_payoffs
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def load_migration(filename: str = "004_room_level_pairs.py"):
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(MIGRATIONS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reshuffled(pairs):
+    """與原配對完全不同的另一組配對（4 位玩家）"""
+    (a, b), (c, d) = pairs
+    return [(a, c), (b, d)]
+
+
+def make_legacy_room(db, make_game):
+    """Round 1 一組配對，Round 2 另外存了一組不同的配對（舊版本每回合重新洗牌）"""
+    room_id, round1_id, player_ids = make_game(players=4)
+    round1_pairs = [(p.player1_id, p.player2_id) for p in get_pairs_in_round(round1_id, db)]
+    for player_id in player_ids:
+        RoundManager.submit_action(db, round1_id, player_id, Choice.TURN)
+
+    round2 = RoundManager.create_round(db, room_id)
+    round2_pairs = reshuffled(round1_pairs)
+    for player1_id, player2_id in round2_pairs:
+        db.add(Pair(room_id=room_id, round_id=round2.id, player1_id=player1_id, player2_id=player2_id))
+    db.commit()
+    return room_id, round1_id, round2.id, player_ids, round2_pairs
+
+
+def test_mismatched_room_is_normalized(db, make_game):
+    room_id, round1_id, round2_id, player_ids, round2_pairs = make_legacy_room(db, make_game)
+    assert count_room_pairs(room_id, db) == 4
+
+    load_migration().upgrade()
+    db.expire_all()
+
+    # 只剩最後一組配對，每位玩家只有一個對手
+    assert count_room_pairs(room_id, db) == 2
+    assert {(p.player1_id, p.player2_id) for p in get_pairs_in_round(round2_id, db)} == set(round2_pairs)
+    for player1_id, player2_id in round2_pairs:
+        assert get_opponent_id(round2_id, player1_id, db) == player2_id
+        assert get_opponent_id(round2_id, player2_id, db) == player1_id
+
+    # 計數器依正規化後的配對重建
+    for round_obj in db.query(Round).filter(Round.room_id == room_id):
+        assert round_obj.expected_actions == 4
+
+    # Payoff 每個 Action 只算一次
+    for player_id in player_ids:
+        RoundManager.submit_action(db, round2_id, player_id, Choice.ACCELERATE)
+    calculate_round_payoffs(round2_id, db)
+    db.commit()
+    payoffs = [a.payoff for a in db.query(Action).filter(Action.round_id == round2_id)]
+    assert payoffs == [-10] * 4
+
+    history = get_player_round_history(room_id, player_ids[0], db)
+    assert [entry["round_number"] for entry in history] == [2]
+
+
+def test_copied_pairs_are_deleted(db, make_game):
+    room_id, round1_id, _ = make_game(players=4)
+    round1_pairs = [(p.player1_id, p.player2_id) for p in get_pairs_in_round(round1_id, db)]
+    round2 = RoundManager.create_round(db, room_id)
+    for player1_id, player2_id in round1_pairs:
+        db.add(Pair(room_id=room_id, round_id=round2.id, player1_id=player1_id, player2_id=player2_id))
+    db.commit()
+
+    load_migration().upgrade()
+    db.expire_all()
+
+    assert count_room_pairs(room_id, db) == 2
+    assert db.query(Pair).filter(Pair.round_id == round2.id).count() == 0
+
+
+def test_counters_after_003_then_004(db, make_game):
+    """舊資料庫依序跑 003、004：003 以複製過的配對回填計數器，004 刪掉複製後要重建"""
+    room_id, round1_id, player_ids = make_game(players=4)
+    round1_pairs = [(p.player1_id, p.player2_id) for p in get_pairs_in_round(round1_id, db)]
+    for player_id in player_ids:
+        RoundManager.submit_action(db, round1_id, player_id, Choice.TURN)
+
+    # 舊版本：每個回合都複製一份 Round 1 的配對，計數器欄位還不存在（0）
+    round_ids = [round1_id]
+    for _ in range(2):
+        round_obj = RoundManager.create_round(db, room_id)
+        round_ids.append(round_obj.id)
+        for player1_id, player2_id in round1_pairs:
+            db.add(Pair(room_id=room_id, round_id=round_obj.id, player1_id=player1_id, player2_id=player2_id))
+    db.query(Round).filter(Round.room_id == room_id).update(
+        {Round.expected_actions: 0, Round.submitted_actions: 0}, synchronize_session=False
+    )
+    db.commit()
+
+    load_migration("003_add_round_counters.py").upgrade()
+    db.expire_all()
+    assert {r.expected_actions for r in db.query(Round).filter(Round.room_id == room_id)} == {12}
+
+    load_migration().upgrade()
+    db.expire_all()
+    counters = {
+        r.id: (r.expected_actions, r.submitted_actions)
+        for r in db.query(Round).filter(Round.room_id == room_id)
+    }
+    assert counters == {round_ids[0]: (4, 4), round_ids[1]: (4, 0), round_ids[2]: (4, 0)}
+
+    # 進行中的回合可以正常跳過（補齊 Action、結算、公布）
+    skipped = RoundManager.skip_round(db, round_ids[2])
+    assert skipped.status == RoundStatus.COMPLETED
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+測試 core/round_manager.py
+
+- 提交冪等性：同一玩家同一回合重複提交不會報錯，也不會重複計數
+  （ON CONFLICT DO NOTHING 與 SAVEPOINT fallback 兩條路徑都測）
+- skip_round：補齊缺少的 Action、更新計數器、結算並公布
+
+執行：
+    python -m pytest test_round_manager.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import core.round_manager
+import main
+from core.exceptions import InvalidStateTransition
+from core.round_manager import RoundManager
+from models import Action, Choice, EventLog, Room, Round, RoundStatus
+from utils.round_counters import check_round_counters
+
+
+@pytest.fixture(params=["on_conflict", "savepoint"])
+def insert_path(request, monkeypatch):
+    if request.param == "savepoint":
+        monkeypatch.setattr(core.round_manager, "_CONFLICT_INSERTS", {})
+    return request.param
+
+
+def snapshot(db, room_id, round_id, player_id):
+    """(該玩家的 Action 數, submitted_actions, state_version)"""
+    db.expire_all()
+    count = db.query(Action).filter(Action.round_id == round_id, Action.player_id == player_id).count()
+    return count, db.get(Round, round_id).submitted_actions, db.get(Room, room_id).state_version
+
+
+def test_duplicate_submit_is_noop(db, make_game, insert_path):
+    room_id, round_id, player_ids = make_game()
+    player_id = player_ids[0]
+
+    first, created = RoundManager.submit_action(db, round_id, player_id, Choice.TURN)
+    assert created
+    before = snapshot(db, room_id, round_id, player_id)
+    assert before[:2] == (1, 1)
+
+    again, created = RoundManager.submit_action(db, round_id, player_id, Choice.ACCELERATE)
+    assert not created
+    assert again.id == first.id and again.choice == Choice.TURN
+    assert snapshot(db, room_id, round_id, player_id) == before
+
+
+def test_duplicate_submit_and_finalize_is_noop(db, make_game, insert_path):
+    room_id, round_id, player_ids = make_game()
+    player_id = player_ids[0]
+
+    RoundManager.submit_and_try_finalize(db, round_id, player_id, Choice.TURN)
+    before = snapshot(db, room_id, round_id, player_id)
+
+    _, created, finalized = RoundManager.submit_and_try_finalize(db, round_id, player_id, Choice.TURN)
+    assert not created and not finalized
+    assert snapshot(db, room_id, round_id, player_id) == before
+
+
+def test_duplicate_submit_via_api(db, make_game, insert_path):
+    room_id, round_id, player_ids = make_game()
+    client = TestClient(main.app)
+    body = {"player_id": player_ids[0], "choice": Choice.TURN.value}
+
+    for _ in range(2):
+        response = client.post(f"/api/rooms/{room_id}/rounds/1/action", json=body)
+        assert response.status_code == 200
+    assert snapshot(db, room_id, round_id, player_ids[0])[:2] == (1, 1)
+
+
+def test_skip_round_fills_missing_actions_and_publishes(db, make_game):
+    room_id, round_id, player_ids = make_game()
+    RoundManager.submit_action(db, round_id, player_ids[0], Choice.ACCELERATE)
+    version = db.get(Room, room_id).state_version
+
+    RoundManager.skip_round(db, round_id)
+    db.expire_all()
+
+    actions = {a.player_id: a for a in db.query(Action).filter(Action.round_id == round_id)}
+    assert set(actions) == set(player_ids)
+    assert actions[player_ids[0]].choice == Choice.ACCELERATE
+    assert all(actions[p].choice == Choice.TURN for p in player_ids[1:])
+    assert all(a.payoff is not None for a in actions.values())
+
+    round_obj = db.get(Round, round_id)
+    assert (round_obj.submitted_actions, round_obj.expected_actions) == (4, 4)
+    assert round_obj.result_calculated and round_obj.status == RoundStatus.COMPLETED
+    # 補交、結算、公布合併成一次 bump
+    assert db.get(Room, room_id).state_version == version + 1
+
+    submitted = db.query(EventLog).filter(
+        EventLog.room_id == room_id,
+        EventLog.event_type == "ACTION_SUBMITTED"
+    ).count()
+    assert submitted == 4
+
+
+def test_skip_round_publishes_finalized_round(db, make_game):
+    _, round_id, player_ids = make_game()
+    for player_id in player_ids:
+        RoundManager.submit_and_try_finalize(db, round_id, player_id, Choice.TURN)
+    assert db.get(Round, round_id).status == RoundStatus.READY_TO_PUBLISH
+
+    RoundManager.skip_round(db, round_id)
+    db.expire_all()
+    assert db.get(Round, round_id).status == RoundStatus.COMPLETED
+    assert db.query(Action).filter(Action.round_id == round_id).count() == 4
+
+    # 已公布：冪等
+    assert RoundManager.skip_round(db, round_id).status == RoundStatus.COMPLETED
+
+
+def test_skip_round_with_legacy_counters(db, make_game):
+    """計數器與配對不一致（未重建的舊資料）：跳過失敗且不留下補交的 Action，重建後即可跳過"""
+    room_id, round_id, player_ids = make_game()
+    RoundManager.submit_action(db, round_id, player_ids[0], Choice.TURN)
+    db.get(Round, round_id).expected_actions = 12
+    db.commit()
+
+    with pytest.raises(InvalidStateTransition):
+        RoundManager.skip_round(db, round_id)
+    db.expire_all()
+    assert db.query(Action).filter(Action.round_id == round_id).count() == 1
+    assert db.get(Round, round_id).status == RoundStatus.WAITING_ACTIONS
+
+    check_round_counters(db, room_id=room_id, fix=True)
+    RoundManager.skip_round(db, round_id)
+    db.expire_all()
+    round_obj = db.get(Round, round_id)
+    assert (round_obj.submitted_actions, round_obj.expected_actions) == (4, 4)
+    assert round_obj.status == RoundStatus.COMPLETED
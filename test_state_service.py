@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+測試 services/state_service.py：批次摘要與 /state 快照
+
+執行：
+    python -m pytest test_state_service.py
+"""
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import services.state_service
+from core.round_manager import RoundManager
+from database import SessionLocal
+from models import Choice, Message, Room
+from schemas import RoomStateResponse
+from services.indicator_service import assign_indicators
+from services.pairing_service import get_opponent_id
+from services.snapshot_cache import snapshot_cache
+from services.state_history import state_history
+from services.state_service import (
+    bump_state_version,
+    render_room_state,
+    snapshot_flights,
+    summarize_changed_rooms,
+)
+from services.version_table import room_versions
+
+
+def test_summary_reports_version_read_with_row(db, make_game):
+    room_id, _, _ = make_game()
+    version = db.get(Room, room_id).state_version
+
+    # 版本表比這一列新（例如另一個 request 剛 commit）：摘要仍回報與進度欄位同一次讀到的版本
+    room_versions.observe(room_id, version + 5)
+    summaries, missing = summarize_changed_rooms(db, {room_id: 0, "no-such-room": 0})
+
+    assert missing == ["no-such-room"]
+    assert [s.version for s in summaries] == [version]
+    assert summaries[0].submitted_actions == 0
+
+
+def assert_matches_model(body: bytes) -> RoomStateResponse:
+    """手動拼接的 JSON 與 response model 序列化的結果完全相同（沒有多或少的欄位）"""
+    model = RoomStateResponse.model_validate_json(body)
+    assert json.loads(body) == json.loads(model.model_dump_json())
+    return model
+
+
+@pytest.fixture
+def played_room(db, make_game):
+    """Round 1-4 已公布，Round 5（訊息回合）進行中：有指標、訊息、一位玩家已提交"""
+    room_id, round_id, player_ids = make_game()
+    for _ in range(4):
+        for player_id in player_ids:
+            RoundManager.submit_and_try_finalize(db, round_id, player_id, Choice.ACCELERATE)
+        RoundManager.publish_round(db, round_id)
+        round_id = RoundManager.create_round(db, room_id).id
+
+    assign_indicators(room_id, db)
+    receiver_id = get_opponent_id(round_id, player_ids[0], db)
+    db.add(Message(room_id=room_id, round_id=round_id, sender_id=player_ids[0],
+                   receiver_id=receiver_id, content="hi"))
+    db.commit()
+    RoundManager.submit_action(db, round_id, player_ids[0], Choice.TURN)
+    snapshot_cache.clear()
+    return room_id, round_id, player_ids, receiver_id
+
+
+def test_shared_and_player_bodies_match_model(db, played_room):
+    room_id, _, player_ids, receiver_id = played_room
+
+    shared = assert_matches_model(render_room_state(db, room_id, 0).body)
+    assert shared.has_update and shared.data.player_history is None
+
+    for player_id in player_ids:
+        model = assert_matches_model(render_room_state(db, room_id, 0, player_id).body)
+        assert model.data.indicator_symbol
+        assert [entry.round_number for entry in model.data.player_history] == [1, 2, 3, 4]
+        assert (model.data.message is not None) == (player_id == receiver_id)
+    db.rollback()
+
+
+def test_delta_and_unchanged_bodies_match_model(db, played_room):
+    room_id, round_id, player_ids, _ = played_room
+    player_id = player_ids[1]
+    base = render_room_state(db, room_id, 0, player_id, delta=True)
+    db.rollback()
+
+    RoundManager.submit_action(db, round_id, player_id, Choice.ACCELERATE)
+    delta = render_room_state(db, room_id, base.version, player_id, delta=True)
+    model = assert_matches_model(delta.body)
+    assert model.data is None and model.base_version == base.version and model.patch
+
+    unchanged = render_room_state(db, room_id, delta.version, player_id)
+    model = assert_matches_model(unchanged.body)
+    assert not model.has_update and model.version == delta.version
+    db.rollback()
+
+
+def concurrent_renders(monkeypatch, room_id, during_flight=None):
+    """
+    兩個 thread 同時 render 同一個版本：leader 建快照時被擋住，直到 follower 開始等待
+    （以及 during_flight() 執行完）才放行
+
+    返回：
+        (leader 結果, follower 結果, 建快照次數)
+    """
+    original = services.state_service._build_shared_state
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow_build(db, room):
+        builds.append(room.id)
+        started.set()
+        assert release.wait(5)
+        return original(db, room)
+
+    monkeypatch.setattr(services.state_service, "_build_shared_state", slow_build)
+    snapshot_cache.clear()
+    results = {}
+
+    def render(name):
+        db = SessionLocal()
+        try:
+            results[name] = render_room_state(db, room_id, 0)
+        finally:
+            db.close()
+
+    leader = threading.Thread(target=render, args=("leader",))
+    leader.start()
+    assert started.wait(5)
+
+    followers = snapshot_flights.stats()["followers"]
+    follower = threading.Thread(target=render, args=("follower",))
+    follower.start()
+    deadline = time.monotonic() + 5
+    while snapshot_flights.stats()["followers"] == followers:
+        assert time.monotonic() < deadline, "second render never joined the flight"
+        time.sleep(0.01)
+
+    if during_flight is not None:
+        during_flight()
+    release.set()
+    leader.join()
+    follower.join()
+    return results["leader"], results["follower"], len(builds)
+
+
+def test_follower_keeps_version_of_shared_build_when_bumped_mid_flight(db, make_game, monkeypatch):
+    room_id, _, _ = make_game()
+    version = db.get(Room, room_id).state_version
+    db.rollback()
+
+    def bump():
+        bump_state_version(db, room_id, reason="test")
+        db.commit()
+
+    _, follower, _ = concurrent_renders(monkeypatch, room_id, during_flight=bump)
+
+    assert follower.version == version
+    assert json.loads(follower.body)["version"] == version
+    assert state_history.get(room_id, None, version + 1) is None
+
+
+def test_concurrent_renders_share_one_build(db, make_game, monkeypatch):
+    room_id, _, _ = make_game()
+    version = db.get(Room, room_id).state_version
+    db.rollback()
+
+    leader, follower, builds = concurrent_renders(monkeypatch, room_id)
+
+    assert builds == 1
+    assert leader.version == follower.version == version
+    assert leader.body == follower.body
+    assert_matches_model(follower.body)
+
+
+def test_cached_shared_state_holds_no_orm_objects(db, played_room):
+    room_id, _, _, receiver_id = played_room
+    version = render_room_state(db, room_id, 0).version
+    db.close()
+
+    shared = snapshot_cache.get(room_id, version)
+    assert list(shared.messages) == [receiver_id]
+    assert all(isinstance(body, bytes) for body in shared.messages.values())
+
+    # 另一個 session 從快取組出收件者的快照（建立快取的 session 已關閉）
+    other = SessionLocal()
+    try:
+        model = assert_matches_model(render_room_state(other, room_id, 0, receiver_id).body)
+    finally:
+        other.close()
+    assert model.data.message.content == "hi"
+
+
+def test_deleting_room_drops_its_cached_snapshots(db, make_game):
+    room_id, _, player_ids = make_game()
+    version = render_room_state(db, room_id, 0, player_ids[0]).version
+    db.rollback()
+    assert snapshot_cache.get(room_id, version) is not None
+
+    assert TestClient(main.app).delete(f"/api/rooms/{room_id}").status_code == 200
+    assert snapshot_cache.get(room_id, version) is None
+    assert snapshot_cache.get(room_id, version, player_ids[0]) is None
@@ -0,0 +1,66 @@
+"""
+HTTP Cache Utility
+
+職責：
+- 產生 ETag
+- 判斷 If-None-Match 是否命中
+- 產生不帶 body 的 304 回應
+
+使用原則：
+- ETag 只用 request 參數與 state_version 等「不必建快照就知道」的資訊產生，
+  這樣命中時可以在任何查詢/序列化之前直接回 304
+- 寫入後就不會再變的資源（已計算的回合結果、配對、訊息、結束房間的摘要）
+  只在內容已定案時才回傳 ETag，之後命中不需要再查內容；
+  但房間可能被刪除、player_id 可能是錯的，回 304 之前仍要做一次主鍵查詢確認
+  （RoomManager.room_has_player），不存在就照常走到 404
+"""
+from typing import Optional
+
+from fastapi import Response
+
+# 會隨 state_version 改變的資源：每次都要重新驗證
+REVALIDATE = "private, no-cache"
+# 定案後不會再變的資源
+IMMUTABLE = "private, max-age=86400, immutable"
+
+
+def make_etag(*parts) -> str:
+    """
+    由多個片段組成 weak ETag
+
+    範例：
+        make_etag("state", room_id, 12, player_id) -> 'W/"state:<room_id>:12:<player_id>"'
+    """
+    return 'W/"' + ":".join(str(p) for p in parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    檢查 If-None-Match header 是否包含指定 ETag（weak comparison，RFC 9110）
+
+    注意：
+        - 不接受 "*"：它只表示「有任何版本」，client 不一定看過內容，
+          對 immutable 資源回 304 會讓從沒拿過 body 的 client 拿不到資料
+    """
+    if not if_none_match:
+        return False
+
+    target = _opaque_tag(etag)
+    return any(_opaque_tag(candidate.strip()) == target for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    """304 Not Modified（不帶 body）"""
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+def set_etag(response: Response, etag: str, cache_control: str = REVALIDATE) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
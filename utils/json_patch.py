@@ -0,0 +1,62 @@
+"""
+JSON Patch Utility（RFC 6902）
+
+職責：
+- 產生兩份 JSON 文件之間的 patch（只用 add / remove / replace）
+
+使用原則：
+- dict 逐 key 比對，list 逐 index 比對（尾端多出來用 add，少掉用 remove）
+- 不做 move / copy 偵測：/state 的變化多半是某個欄位改值或 list 多一筆，
+  逐 index 比對產生的 patch 已經夠小，也讓前端套用邏輯保持簡單
+"""
+from typing import Any, Dict, List
+
+JsonPatch = List[Dict[str, Any]]
+
+
+def make_patch(old: Any, new: Any) -> JsonPatch:
+    """
+    產生把 old 變成 new 的 JSON Patch
+
+    範例：
+        make_patch({"a": 1, "b": [1]}, {"a": 2, "b": [1, 2]})
+        -> [{"op": "replace", "path": "/a", "value": 2},
+            {"op": "add", "path": "/b/1", "value": 2}]
+    """
+    ops: JsonPatch = []
+    _diff(old, new, "", ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: str, ops: JsonPatch) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, old_value in old.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in new:
+                ops.append({"op": "remove", "path": child})
+            else:
+                _diff(old_value, new[key], child, ops)
+        for key, new_value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": new_value})
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for i in range(common):
+            _diff(old[i], new[i], f"{path}/{i}", ops)
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        # 從尾端往前刪，前面的 index 才不會位移
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return
+
+    # 型別不同或純量：True == 1 在 Python 成立，所以型別也要一起比
+    if type(old) is not type(new) or old != new:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def _escape(token: str) -> str:
+    """RFC 6901：~ 轉成 ~0、/ 轉成 ~1"""
+    return str(token).replace("~", "~0").replace("/", "~1")
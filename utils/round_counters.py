@@ -0,0 +1,114 @@
+"""
+Round Counter Consistency Utility
+
+職責：
+- 檢查 Round.expected_actions / submitted_actions 是否與 pairs / actions 一致
+- 需要時由 pairs / actions 重建計數器
+
+使用時機：
+- migration 003 新增欄位後回填既有資料
+- 懷疑計數器漂移時（例如手動改過 actions）做一次檢查
+
+執行：
+    python utils/round_counters.py            # 只檢查
+    python utils/round_counters.py --fix      # 檢查並修正
+"""
+import logging
+import os
+import sys
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Action, Pair, Round
+
+logger = logging.getLogger(__name__)
+
+
+def check_round_counters(db: Session, room_id: Optional[str] = None, fix: bool = False) -> list[dict]:
+    """
+    比對每個 Round 的計數器與實際資料
+
+    參數：
+        db: 資料庫 session
+        room_id: 只檢查這個房間（None 表示全部）
+        fix: True 時把不一致的計數器改成實際值並 commit
+
+    返回：
+        不一致的回合列表，每筆包含：
+            round_id, expected_actions / submitted_actions（目前值）,
+            actual_expected / actual_submitted（由 pairs / actions 算出）
+
+    實作：
+        pairs、actions 各一個 GROUP BY 子查詢，和 rounds 一次 join 完成
+    """
+    # 配對是房間層級的：每個回合的預期提交數 = 房間配對數 × 2
+    pair_counts = (
+        db.query(Pair.room_id, func.count(Pair.id).label("pair_count"))
+        .group_by(Pair.room_id)
+        .subquery()
+    )
+    action_counts = (
+        db.query(Action.round_id, func.count(Action.id).label("action_count"))
+        .group_by(Action.round_id)
+        .subquery()
+    )
+
+    query = (
+        db.query(
+            Round,
+            func.coalesce(pair_counts.c.pair_count, 0),
+            func.coalesce(action_counts.c.action_count, 0)
+        )
+        .outerjoin(pair_counts, pair_counts.c.room_id == Round.room_id)
+        .outerjoin(action_counts, action_counts.c.round_id == Round.id)
+    )
+    if room_id:
+        query = query.filter(Round.room_id == room_id)
+
+    mismatches = []
+    for round_obj, pair_count, action_count in query.all():
+        actual_expected = pair_count * 2
+        if (round_obj.expected_actions, round_obj.submitted_actions) == (actual_expected, action_count):
+            continue
+
+        mismatches.append({
+            "round_id": round_obj.id,
+            "expected_actions": round_obj.expected_actions,
+            "submitted_actions": round_obj.submitted_actions,
+            "actual_expected": actual_expected,
+            "actual_submitted": action_count,
+        })
+
+        if fix:
+            round_obj.expected_actions = actual_expected
+            round_obj.submitted_actions = action_count
+
+    if mismatches:
+        logger.warning(f"Found {len(mismatches)} rounds with inconsistent counters (fix={fix})")
+    if fix and mismatches:
+        db.commit()
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    fix = "--fix" in sys.argv
+    db = SessionLocal()
+    try:
+        rows = check_round_counters(db, fix=fix)
+        for row in rows:
+            print(
+                f"round {row['round_id']}: "
+                f"expected {row['expected_actions']} -> {row['actual_expected']}, "
+                f"submitted {row['submitted_actions']} -> {row['actual_submitted']}"
+            )
+        print(f"{len(rows)} inconsistent rounds" + (" fixed" if fix and rows else ""))
+    finally:
+        db.close()
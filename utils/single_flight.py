@@ -0,0 +1,116 @@
+"""
+Single-flight Utility
+
+職責：
+- 同一個 key 同時只執行一次昂貴的工作，其他同時到達的呼叫等待並共用結果
+
+使用原則：
+- sync（threadpool 內的 endpoint）用 do()，async 路徑用 do_async()
+  兩者共用同一張 flight 表：sync 的 leader 可以服務 async 的 follower，反之亦然
+- 只合併「同時」進行中的呼叫，結果不會被保留；需要快取請另外放進快取
+- leader 失敗時，所有 follower 收到同一個例外（不會各自重試，避免一起打爆 DB）
+"""
+import asyncio
+from concurrent.futures import Future
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Thread-safe；可同時被 threadpool 與 event loop 使用"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._followers = 0
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], T],
+        before_wait: Optional[Callable[[], Any]] = None
+    ) -> T:
+        """
+        執行 fn()，或等待同一個 key 進行中的那次執行
+
+        參數：
+            key: 合併的單位（例如 (room_id, state_version)）
+            fn: 實際工作
+            before_wait: 成為 follower、開始等待前呼叫
+                         （例如先把 DB 連線還給 pool，等待期間不佔連線）
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            if before_wait is not None:
+                before_wait()
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        before_wait: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> T:
+        """do() 的 async 版本：fn、before_wait 為 coroutine function，follower 等待時不佔 thread"""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            if before_wait is not None:
+                await before_wait()
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self._leaders,
+                "followers": self._followers,
+            }
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self._followers += 1
+                return future, False
+
+            future = Future()
+            self._flights[key] = future
+            self._leaders += 1
+            return future, True
+
+    def _finish(
+        self,
+        key: Hashable,
+        future: Future,
+        result: Any = None,
+        error: Optional[BaseException] = None
+    ) -> None:
+        # 先移出 flight 表再設定結果：之後到達的呼叫會開新的 flight，
+        # 不會拿到這次（可能已經過時）的結果
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
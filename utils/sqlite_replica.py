@@ -0,0 +1,61 @@
+"""
+SQLite Replica Utility（本機測試讀寫分離用）
+
+職責：
+- 定期把 primary 的 SQLite 檔案複製到另一個檔案，模擬一個會落後的唯讀 replica
+- 每次複製用 sqlite3 backup API，讀取端看到的永遠是某個 commit 之後的完整快照
+
+使用方式：
+    # .env
+    DATABASE_URL=sqlite:///./chicken_game.db
+    READ_DATABASE_URL=sqlite:///./chicken_game_replica.db
+
+    python utils/sqlite_replica.py ./chicken_game.db ./chicken_game_replica.db --interval 1
+
+注意：
+- 只用於開發 / 測試；replica 落後的時間大約是 interval 秒，
+  READ_YOUR_WRITES_SECONDS 要大於它，玩家才讀得到自己剛寫入的資料
+"""
+import argparse
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def copy_database(primary_path: str, replica_path: str) -> None:
+    """把 primary 的目前內容整份複製到 replica"""
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def run(primary_path: str, replica_path: str, interval: float) -> None:
+    """每 interval 秒複製一次，直到被中斷"""
+    while True:
+        try:
+            copy_database(primary_path, replica_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Replica copy failed, retrying: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy a SQLite primary into a lagging replica file")
+    parser.add_argument("primary", help="primary SQLite file (DATABASE_URL)")
+    parser.add_argument("replica", help="replica SQLite file (READ_DATABASE_URL)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between copies (replica lag)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    copy_database(args.primary, args.replica)
+    print(f"Replicating {args.primary} -> {args.replica} every {args.interval}s (Ctrl+C to stop)")
+    try:
+        run(args.primary, args.replica, args.interval)
+    except KeyboardInterrupt:
+        pass